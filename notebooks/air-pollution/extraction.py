@@ -1,10 +1,15 @@
-# Authenticate and initialize Earth Engine
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
 import ee
-ee.Authenticate()
-ee.Initialize()
-import geemap
 import pandas as pd
-from datetime import datetime, timedelta
 
 def calculate_monthly_no2_at_native_resolution(year, month, aoi, NO2Collection):
     """
@@ -140,6 +145,31 @@ def calculate_daily_no2_for_single_day(start_date, aoi, NO2Collection):
     
     return sampled_pixels_with_date
 
+def calculate_daily_no2_for_dates(dates, aoi, NO2Collection):
+    """
+    Daily NO2 for many days as a single FeatureCollection, computed in one server-side graph.
+
+    The per-day computation of calculate_daily_no2_for_single_day (pixels
+    sampled over aoi) is mapped over an ee.List of the dates and the results
+    flattened, so one getInfo() returns all days x pixels. Every feature gets
+    a 'date' property; days without images give no features.
+    """
+    def daily_features(date):
+        start_date = ee.Date(date)
+        filtered_day = NO2Collection.filterDate(start_date, start_date.advance(1, 'day'))
+        features = filtered_day.mean().sample(
+            region=aoi,
+            scale=1000,
+            projection='EPSG:4326',
+            geometries=True
+        )
+        features = features.map(lambda feature: feature.set('date', start_date.format('YYYY-MM-dd')))
+        # The mean of an empty collection has no bands and can not be sampled
+        return ee.Algorithms.If(filtered_day.size().gt(0), features, ee.FeatureCollection([]))
+
+    return ee.FeatureCollection(ee.List(list(dates)).map(daily_features)).flatten()
+
+
 def calculate_monthly_no2_for_single_month(year, month, aoi, NO2Collection):
     # Define the start and end dates for the given month
     start_date = ee.Date(f"{year}-{month:02d}-01")
@@ -176,119 +206,627 @@ def split_dates_into_chunks(start_date, end_date, chunk_size=10):
     
     return chunks
 
-import time
+
+QUOTA_ERROR_MESSAGES = ('quota', 'rate limit', 'too many requests', 'too many concurrent', '429',
+                        'service unavailable', '503')
+
+
+def is_quota_error(exc):
+    """True for Earth Engine errors worth retrying: quota, rate limit and transient server errors."""
+    message = str(exc).lower()
+    return any(text in message for text in QUOTA_ERROR_MESSAGES)
+
+
+def ee_get_info(request):
+    """Default backend of EERequestScheduler: compute an ee object and return its value."""
+    return request.getInfo()
+
+
+def start_export(task):
+    """EERequestScheduler backend starting an export task, returns the task."""
+    task.start()
+    return task
+
+
+class EERequestScheduler:
+    """
+    Run many Earth Engine requests (e.g. one per day or month) concurrently.
+
+    Requests are executed by ``backend`` on a bounded thread pool, at most
+    ``max_requests_per_second`` are started per second, and requests failing
+    with a quota error (see is_quota_error) are retried with exponential
+    backoff and jitter. Results are returned in the order of the requests.
+    The backend is any callable taking a request and returning its result,
+    so the scheduler can be run against a local mock of the ee client.
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of requests in flight at the same time
+    max_requests_per_second : float, optional
+        Rate limit on starting requests, including retries
+    max_retries : int
+        Number of retries of a request failing with a quota error
+    backoff : float
+        Wait in seconds before the first retry, doubled on each retry
+    max_backoff : float
+        Longest wait between retries in seconds
+    backend : callable, optional
+        Executes a request, defaults to ee_get_info
+    retry_on : callable, optional
+        Takes an exception and returns True if the request should be retried,
+        defaults to is_quota_error
+    """
+
+    def __init__(self, max_workers=8, max_requests_per_second=None, max_retries=5, backoff=2.0,
+                 max_backoff=120.0, backend=None, retry_on=None):
+        self.max_workers = max_workers
+        self.max_requests_per_second = max_requests_per_second
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.backend = backend or ee_get_info
+        self.retry_on = retry_on or is_quota_error
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def _wait_for_rate_limit(self):
+        if not self.max_requests_per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + 1.0 / self.max_requests_per_second
+        time.sleep(max(start - now, 0))
+
+    def _run(self, request, backend=None):
+        backend = backend or self.backend
+        attempt = 0
+        while True:
+            self._wait_for_rate_limit()
+            with self._lock:
+                self.requests += 1
+            try:
+                return backend(request)
+            except Exception as exc:
+                if attempt >= self.max_retries or not self.retry_on(exc):
+                    raise
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"Quota error ({exc}), retrying in {delay:.1f}s")
+                with self._lock:
+                    self.retries += 1
+                attempt += 1
+                time.sleep(delay)
+
+    def imap(self, requests, backend=None):
+        """
+        Yield the results of requests in order, as soon as each one and all before it are done.
+
+        At most 2 * max_workers results are held, so requests can be a long
+        (lazy) iterable. ``backend`` overrides the scheduler's backend for
+        these requests.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for request in requests:
+                pending.append(executor.submit(self._run, request, backend))
+                if len(pending) >= 2 * self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def map(self, requests, backend=None):
+        """Return the results of all requests as a list, in order."""
+        return list(self.imap(requests, backend=backend))
+
+
+EXPORT_STATE_DIR = Path('./data/air_pollution/export_state')
+TERMINAL_TASK_STATES = ('COMPLETED', 'FAILED', 'CANCELLED')
+
+
+def ee_task_status(task_ids):
+    """Default status backend of ExportTaskTracker: one batched status call for many tasks."""
+    return ee.data.getTaskStatus(list(task_ids))
+
+
+class ExportTaskTracker:
+    """
+    Start many Earth Engine exports up front and monitor them all without blocking on each one.
+
+    Tasks are started through an EERequestScheduler (so quota errors on start
+    are retried) and their IDs and states are kept in a JSON state file. All
+    unfinished tasks are polled with a single batched status call. The poll
+    interval starts at ``min_interval`` and grows by ``backoff_factor`` up
+    to ``max_interval`` while nothing changes, and is reset when a task
+    changes state. A restarted job with the same state file resumes
+    monitoring the tasks still in flight instead of starting them again,
+    skips completed exports unless asked to resubmit them, and starts
+    failed or cancelled exports again.
+
+    Parameters
+    ----------
+    state_file : str, optional
+        JSON file mapping each export key to its task ID and last state.
+        Nothing is persisted if not provided
+    scheduler : EERequestScheduler, optional
+        Starts the tasks, defaults to 4 workers, 2 starts per second
+    status_backend : callable, optional
+        Takes a list of task IDs and returns their status dicts (with id and
+        state), defaults to ee_task_status
+    min_interval, max_interval : float
+        Shortest and longest wait between polls in seconds
+    backoff_factor : float
+        Growth of the poll interval while no task changes state
+    """
+
+    def __init__(self, state_file=None, scheduler=None, status_backend=None, min_interval=10.0,
+                 max_interval=300.0, backoff_factor=1.5):
+        self.state_file = Path(state_file) if state_file is not None else None
+        self.scheduler = scheduler or EERequestScheduler(max_workers=4, max_requests_per_second=2,
+                                                         backend=start_export)
+        self.status_backend = status_backend or ee_task_status
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.state = {}
+        if self.state_file is not None and self.state_file.exists():
+            self.state = json.loads(self.state_file.read_text())
+
+    def _save(self):
+        if self.state_file is None:
+            return
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_suffix('.tmp')
+        tmp_file.write_text(json.dumps(self.state, indent=1))
+        tmp_file.replace(self.state_file)
+
+    def submit(self, exports, resubmit=False):
+        """
+        Start exports that were not submitted before (or failed).
+
+        Parameters
+        ----------
+        exports : dict
+            Maps a key (e.g. the output URI and export mode) to a callable returning the
+            unstarted ee.batch.Task, so tasks are only built when they need
+            to be started
+        resubmit : bool
+            Start all exports again, including completed and in-flight ones
+
+        Returns
+        -------
+        list
+            Keys of the exports started
+        """
+        states = {key: self.state.get(key, {}).get('state') for key in exports}
+        if resubmit:
+            keys = list(exports)
+        else:
+            keys = [key for key, state in states.items() if state in (None, 'FAILED', 'CANCELLED')]
+            completed = sum(state == 'COMPLETED' for state in states.values())
+            if completed:
+                print(f"Skipping {completed} exports already completed, pass resubmit=True to export them again")
+            if len(keys) + completed < len(exports):
+                print(f"Resuming {len(exports) - len(keys) - completed} exports still in flight")
+        for key, task in zip(keys, self.scheduler.imap(exports[key]() for key in keys)):
+            self.state[key] = {'id': task.id, 'state': 'SUBMITTED'}
+            # Saved after each start, a crash never loses a running task
+            self._save()
+        return keys
+
+    def poll(self, keys=None):
+        """
+        Refresh the state of all unfinished tasks with one batched status call.
+
+        Returns
+        -------
+        bool
+            True if any task changed state
+        """
+        keys = list(self.state) if keys is None else list(keys)
+        pending = {self.state[key]['id']: key for key in keys
+                   if self.state[key]['state'] not in TERMINAL_TASK_STATES}
+        if not pending:
+            return False
+        changed = False
+        for status in self.status_backend(list(pending)):
+            key = pending.get(status.get('id'))
+            if key is None:
+                continue
+            entry = self.state[key]
+            if status.get('state') != entry['state']:
+                changed = True
+                entry['state'] = status.get('state')
+                if status.get('error_message'):
+                    entry['error_message'] = status['error_message']
+        if changed:
+            self._save()
+        return changed
+
+    def wait(self, keys=None):
+        """
+        Poll until all tasks (or the given keys) are finished.
+
+        Returns
+        -------
+        dict
+            Maps each key to its final state dict
+        """
+        keys = list(self.state) if keys is None else list(keys)
+        interval = self.min_interval
+        while True:
+            changed = self.poll(keys)
+            states = [self.state[key]['state'] for key in keys]
+            done = sum(state in TERMINAL_TASK_STATES for state in states)
+            if done == len(keys):
+                break
+            interval = self.min_interval if changed else min(interval * self.backoff_factor, self.max_interval)
+            print(f"Exporting... {done}/{len(keys)} tasks done, "
+                  f"{states.count('RUNNING')} running, next check in {interval:.0f}s")
+            time.sleep(interval)
+        return {key: self.state[key] for key in keys}
+
+
+def run_exports(exports, tracker=None, state_file=None, wait=True, resubmit=False):
+    """
+    Submit exports through an ExportTaskTracker and, unless wait is False, report their final status.
+
+    Parameters
+    ----------
+    exports : dict
+        Maps a key to a callable returning the unstarted ee.batch.Task
+    tracker : ExportTaskTracker, optional
+        Share one tracker (with wait=False) to run the exports of several
+        calls together, then call tracker.wait() once
+    state_file : str, optional
+        State file of the tracker created when none is given
+    wait : bool
+        Wait for the exports to finish
+    resubmit : bool
+        Start all exports again, see ExportTaskTracker.submit
+
+    Returns
+    -------
+    ExportTaskTracker
+    """
+    tracker = tracker or ExportTaskTracker(state_file=state_file)
+    tracker.submit(exports, resubmit=resubmit)
+    report_exports(tracker, exports, wait)
+    return tracker
+
+
+def report_exports(tracker, keys, wait=True):
+    """Unless wait is False, wait for the exports of keys and print their final status."""
+    if not wait:
+        return
+    for key, status in tracker.wait(keys=list(keys)).items():
+        if status['state'] == 'COMPLETED':
+            print(f"Export completed successfully: {key}")
+        else:
+            print(f"Export failed: {key} {status}")
+
+
+MANIFEST_FILE = Path('./data/air_pollution/no2_manifest.sqlite')
+IN_FLIGHT_TASK_STATES = ('SUBMITTED', 'READY', 'RUNNING', 'CANCEL_REQUESTED')
+
+
+class PartitionManifest:
+    """
+    SQLite record of the extracted (AOI, date, admin level, bucket) partitions.
+
+    Each partition has a status (a task state: SUBMITTED, RUNNING, COMPLETED,
+    FAILED, ...), the export task ID and output URI, and once completed its
+    row count and checksum. Extraction asks the manifest for the partitions
+    still to do (missing, failed or cancelled), so a rerun over a long date
+    range only pays for new or failed days. Close it when done, or use it
+    in a with statement.
+
+    Parameters
+    ----------
+    path : str
+        SQLite file, created if it does not exist
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS partitions (
+                    aoi TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    admin_level TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    rows INTEGER,
+                    checksum TEXT,
+                    task_id TEXT,
+                    uri TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (aoi, date, admin_level, bucket)
+                )""")
+
+    def record(self, aoi, date, admin_level, bucket, status, rows=None, checksum=None, task_id=None, uri=None):
+        """Insert or update the entry of a partition, keeping known values not given again."""
+        with self._conn:
+            self._conn.execute("""
+                INSERT INTO partitions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (aoi, date, admin_level, bucket) DO UPDATE SET
+                    status = excluded.status,
+                    rows = COALESCE(excluded.rows, rows),
+                    checksum = COALESCE(excluded.checksum, checksum),
+                    task_id = COALESCE(excluded.task_id, task_id),
+                    uri = COALESCE(excluded.uri, uri),
+                    updated_at = excluded.updated_at""",
+                (aoi, date, admin_level, bucket, status, rows, checksum, task_id, uri,
+                 datetime.now(timezone.utc).isoformat(timespec='seconds')))
+
+    def get(self, aoi, date, admin_level, bucket):
+        """Return the entry of a partition as a dict, or None."""
+        cursor = self._conn.execute(
+            "SELECT * FROM partitions WHERE aoi = ? AND date = ? AND admin_level = ? AND bucket = ?",
+            (aoi, date, admin_level, bucket))
+        row = cursor.fetchone()
+        return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+    def pending(self, aoi, dates, admin_level, bucket):
+        """Return the dates without a completed or in-flight partition, in order."""
+        done = {date for date, in self._conn.execute(
+            f"SELECT date FROM partitions WHERE aoi = ? AND admin_level = ? AND bucket = ? AND status IN "
+            f"({', '.join('?' * (len(IN_FLIGHT_TASK_STATES) + 1))})",
+            (aoi, admin_level, bucket, 'COMPLETED', *IN_FLIGHT_TASK_STATES))}
+        return [date for date in dates if date not in done]
+
+    def sync_tasks(self, status_backend=None):
+        """
+        Update in-flight partitions (e.g. submitted with wait=False) with one batched status call.
+
+        Returns
+        -------
+        list
+            (aoi, date, admin_level, bucket, uri) of the partitions which completed
+        """
+        status_backend = status_backend or ee_task_status
+        in_flight = {row[-2]: row[:-2] + row[-1:] for row in self._conn.execute(
+            f"SELECT aoi, date, admin_level, bucket, task_id, uri FROM partitions WHERE task_id IS NOT NULL "
+            f"AND status IN ({', '.join('?' * len(IN_FLIGHT_TASK_STATES))})", IN_FLIGHT_TASK_STATES)}
+        if not in_flight:
+            return []
+        completed = []
+        for status in status_backend(list(in_flight)):
+            partition = in_flight.get(status.get('id'))
+            if partition is None or status.get('state') in (None, 'UNKNOWN'):
+                continue
+            self.record(*partition[:4], status['state'])
+            if status['state'] == 'COMPLETED':
+                completed.append(partition)
+        return completed
+
+    def summary(self):
+        """Number of partitions per AOI, admin level, bucket and status, as a DataFrame."""
+        return pd.read_sql_query(
+            "SELECT aoi, admin_level, bucket, status, COUNT(*) AS partitions, SUM(rows) AS rows FROM partitions "
+            "GROUP BY aoi, admin_level, bucket, status", self._conn)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def gcs_csv_info(uri):
+    """
+    Row count and MD5 checksum of a CSV on GCS, streamed so memory stays flat.
+
+    Needs the optional google-cloud-storage package, returns (None, None)
+    if it is not installed or the object does not exist.
+    """
+    try:
+        from google.cloud import storage
+    except ImportError:
+        return None, None
+
+    bucket_name, _, blob_name = uri[len('gs://'):].partition('/')
+    blob = storage.Client().bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        return None, None
+    lines, last = 0, b'\n'
+    with blob.open('rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    # The last line may not end with a newline, the first one is the header
+    lines += last != b'\n'
+    return max(lines - 1, 0), blob.md5_hash
+
 
 # Initialize an empty DataFrame to store the final results
 
-def process_no2_data_for_aoi_to_drive(aoi, aoi_name, start_date, end_date):
+def export_mode(aoi_name, admin_regions=None, admin_level=None):
+    """
+    Export mode and output name of an export at native resolution or by admin region.
+
+    The mode is 'native', the admin_level of admin_regions (e.g. 'adm1'), or
+    'admin' for admin_regions given without an admin_level. It is part of the
+    tracker keys and state files, so exports in different modes never share
+    a task. Exports with an admin_level are written under
+    no2_<aoi_name>_<admin_level>, all others under no2_<aoi_name> as before.
+
+    Returns
+    -------
+    tuple
+        (mode, output name)
+    """
+    if admin_regions is None:
+        if admin_level not in (None, 'native'):
+            raise ValueError(f"admin_level {admin_level!r} needs admin_regions")
+        return 'native', aoi_name
+    if admin_level in (None, 'admin'):
+        return 'admin', aoi_name
+    if admin_level == 'native':
+        raise ValueError("admin_level 'native' can not be used with admin_regions")
+    return admin_level, f"{aoi_name}_{admin_level}"
+
+
+def process_no2_data_for_aoi_to_drive(aoi, aoi_name, start_date, end_date, tracker=None, wait=True,
+                                      resubmit=False):
+    """
+    Export daily NO2 over the AOI to Google Drive as a single CSV.
+
+    The export is monitored by an ExportTaskTracker (see run_exports), pass a
+    shared tracker and wait=False to run several exports at the same time.
+    A completed export is only started again with resubmit=True.
+    """
     # Load NO2 ImageCollection
     NO2Collection = ee.ImageCollection("COPERNICUS/S5P/NRTI/L3_NO2").select('NO2_column_number_density')
 
     # Create an empty FeatureCollection to accumulate all the days
     final_collection = ee.FeatureCollection([])
 
-    # Split the date range into 10-day chunks
-    date_chunks = split_dates_into_chunks(start_date, end_date)
-
-    # Loop through each 10-day chunk and process data
-    for chunk_start_date, chunk_end_date in date_chunks:
-        print(f"Processing data from {chunk_start_date} to {chunk_end_date}...")
+    print(f"Processing data from {start_date} to {end_date}...")
+    # Each day once, chunk boundary days included (see iter_days)
+    for current_date_str in iter_days(start_date, end_date):
+        # Calculate NO2 for this specific day
+        sampled_pixels_with_date = calculate_daily_no2_for_single_day(current_date_str, aoi, NO2Collection)
 
-        # Loop through each day in this 10-day chunk
-        current_date = datetime.strptime(chunk_start_date, '%Y-%m-%d')
-        end_date_dt = datetime.strptime(chunk_end_date, '%Y-%m-%d')
-
-        while current_date <= end_date_dt:
-            # Convert current date to string format
-            current_date_str = current_date.strftime('%Y-%m-%d')
-            
-            # Calculate NO2 for this specific day
-            sampled_pixels_with_date = calculate_daily_no2_for_single_day(current_date_str, aoi, NO2Collection)
-
-            # Add this day's data to the final collection
-            final_collection = final_collection.merge(sampled_pixels_with_date)
-
-            # Move to the next day
-            current_date += timedelta(days=1)
+        # Add this day's data to the final collection
+        final_collection = final_collection.merge(sampled_pixels_with_date)
 
     # Now export the entire final collection as a single CSV file
     output_file = f'no2_{aoi_name}_{start_date.replace("-", "")}_{end_date.replace("-", "")}.csv'
 
-    # Export the data to Google Drive as a single CSV file
-    export_task = ee.batch.Export.table.toDrive(
-        collection=final_collection,
-        description=f"NO2_sample_{aoi_name}_{start_date}_to_{end_date}",
-        folder="EarthEngineExports",  # The folder in Google Drive where the file will be saved
-        fileNamePrefix=output_file.replace('.csv', ''),  # Remove '.csv' since Earth Engine adds it automatically
-        fileFormat="CSV"
-    )
-    export_task.start()
+    description = f"NO2_sample_{aoi_name}_{start_date}_to_{end_date}"
+    state_name = f"drive_{description}"
 
-    while export_task.active():
-        print('Exporting... Task status:', export_task.status()['state'])
-        time.sleep(30)  # Wait for 30 seconds before checking again
-
-    # Check the final status
-    status = export_task.status()
-    if status['state'] == 'COMPLETED':
-        print(f"Export completed successfully: {output_file}")
-    else:
-        print(f"Export failed: {status}")
+    # Export the data to Google Drive as a single CSV file
+    def export_task():
+        return ee.batch.Export.table.toDrive(
+            collection=final_collection,
+            description=description,
+            folder="EarthEngineExports",  # The folder in Google Drive where the file will be saved
+            fileNamePrefix=output_file.replace('.csv', ''),  # Remove '.csv' since Earth Engine adds it automatically
+            fileFormat="CSV"
+        )
+
+    return run_exports({f"drive://EarthEngineExports/{output_file}": export_task}, tracker=tracker,
+                       state_file=EXPORT_STATE_DIR.joinpath(f"{state_name}.json"), wait=wait, resubmit=resubmit)
+
+def process_no2_data_for_aoi_to_gcs(aoi, aoi_name, start_date, end_date, gcs_bucket, admin_regions=None,
+                                    tracker=None, wait=True, manifest=MANIFEST_FILE, admin_level=None,
+                                    output_info=gcs_csv_info, resubmit=False):
+    """
+    Export daily NO2 over the AOI (or by admin region) to GCS, one CSV per day.
+
+    Exports go to gs://gcs_bucket/no2_<aoi_name>/, or with admin_regions and
+    an admin_level (e.g. 'adm1') to gs://gcs_bucket/no2_<aoi_name>_<admin_level>/,
+    so that exports at several admin levels do not overwrite each other.
+
+    All daily exports are submitted up front and monitored together by an
+    ExportTaskTracker (see run_exports). Its state file is named after the
+    export mode, AOI and date range, so running the same call again resumes
+    monitoring the exports in flight and only resubmits failed days.
+    Pass resubmit=True to export every day again, completed ones included.
+
+    Days are recorded as (aoi_name, date, admin_level, gcs_bucket) partitions
+    in a PartitionManifest with their status, and once completed their row
+    count and checksum (from output_info). Only days which are missing from
+    the manifest or failed are exported, so a nightly run over the whole
+    history (with end_date=None, meaning yesterday) only exports the new days.
+    The exports started by this call are recorded, and so are the days its
+    tracker already has as completed. manifest is a path (opened and closed
+    here) or an open PartitionManifest, pass manifest=None to export every day.
+    """
+    if end_date is None:
+        end_date = (datetime.now(timezone.utc) - timedelta(days=1)).strftime('%Y-%m-%d')
+    admin_level, output_name = export_mode(aoi_name, admin_regions, admin_level)
 
-def process_no2_data_for_aoi_to_gcs(aoi, aoi_name, start_date, end_date, gcs_bucket, admin_regions=None):
     # Load NO2 ImageCollection
     NO2Collection = ee.ImageCollection("COPERNICUS/S5P/NRTI/L3_NO2").select('NO2_column_number_density')
 
-    # Split the date range into 10-day chunks
-    date_chunks = split_dates_into_chunks(start_date, end_date)
-
-    # Loop through each 10-day chunk and process data
-    for chunk_start_date, chunk_end_date in date_chunks:
-        print(f"Processing data from {chunk_start_date} to {chunk_end_date}...")
-
-        # Loop through each day in this 10-day chunk
-        current_date = datetime.strptime(chunk_start_date, '%Y-%m-%d')
-        end_date_dt = datetime.strptime(chunk_end_date, '%Y-%m-%d')
-
-        while current_date <= end_date_dt:
-            # Convert current date to string format
-            current_date_str = current_date.strftime('%Y-%m-%d')
-
-            if admin_regions is not None:
-                # Calculate NO2 for this specific day by admin region
-                sampled_pixels_with_date = calculate_daily_no2_for_single_day_by_admin_region(current_date_str, admin_regions, NO2Collection)
-            else:
-                # Calculate NO2 for this specific day by native resolution
-                sampled_pixels_with_date = calculate_daily_no2_for_single_day(current_date_str, aoi, NO2Collection)
-
-            # Define the output CSV file name with a partition based on date
-            output_file = f"no2_{aoi_name}/{current_date_str.replace('-', '')}.csv"
-
-            # Export the data to Google Cloud Storage as CSV
-            export_task = ee.batch.Export.table.toCloudStorage(
-                collection=sampled_pixels_with_date,
-                description=f"NO2_sample_{aoi_name}_{current_date_str}",
-                bucket=gcs_bucket,
-                fileNamePrefix=output_file.replace('.csv', ''),  # Remove '.csv' since Earth Engine adds it automatically
-                fileFormat="CSV"
-            )
-            export_task.start()
-
-            while export_task.active():
-                print(f'Exporting data for {current_date_str}... Task status:', export_task.status()['state'])
-                time.sleep(30)  # Wait for 30 seconds before checking again
-
-            # Check the final status
-            status = export_task.status()
-            if status['state'] == 'COMPLETED':
-                print(f"Export completed successfully for {current_date_str} to Google Cloud Storage: {output_file}")
-            else:
-                print(f"Export failed for {current_date_str}: {status}")
+    def export_task_for_day(current_date_str):
+        if admin_regions is not None:
+            # Calculate NO2 for this specific day by admin region
+            sampled_pixels_with_date = calculate_daily_no2_for_single_day_by_admin_region(current_date_str, admin_regions, NO2Collection)
+        else:
+            # Calculate NO2 for this specific day by native resolution
+            sampled_pixels_with_date = calculate_daily_no2_for_single_day(current_date_str, aoi, NO2Collection)
 
-            # Move to the next day
-            current_date += timedelta(days=1)
+        # Define the output CSV file name with a partition based on date
+        output_file = f"no2_{output_name}/{current_date_str.replace('-', '')}.csv"
+
+        # Export the data to Google Cloud Storage as CSV
+        return ee.batch.Export.table.toCloudStorage(
+            collection=sampled_pixels_with_date,
+            description=f"NO2_sample_{output_name}_{current_date_str}",
+            bucket=gcs_bucket,
+            fileNamePrefix=output_file.replace('.csv', ''),  # Remove '.csv' since Earth Engine adds it automatically
+            fileFormat="CSV"
+        )
+
+    def record_completed(aoi_name, day, admin_level, bucket, uri):
+        rows, checksum = output_info(uri)
+        manifest.record(aoi_name, day, admin_level, bucket, 'COMPLETED', rows=rows, checksum=checksum, uri=uri)
+
+    # A manifest opened here is closed here, pass a PartitionManifest to keep it open
+    own_manifest = isinstance(manifest, (str, Path))
+    if own_manifest:
+        manifest = PartitionManifest(manifest)
+    try:
+        days = list(iter_days(start_date, end_date))
+        if manifest is not None and not resubmit:
+            # Exports left running by an earlier run with wait=False
+            for partition in manifest.sync_tasks():
+                record_completed(*partition)
+            n_days = len(days)
+            days = manifest.pending(aoi_name, days, admin_level, gcs_bucket)
+            print(f"{n_days - len(days)} of {n_days} days already exported or running")
+
+        print(f"Submitting {len(days)} exports from {start_date} to {end_date}...")
+        exports, key_days = {}, {}
+        for day in days:
+            # The mode is part of the key, the output URI alone is shared by native and 'admin' exports
+            key = f"gs://{gcs_bucket}/no2_{output_name}/{day.replace('-', '')}.csv#{admin_level}"
+            exports[key] = lambda day=day: export_task_for_day(day)
+            key_days[key] = day
+        tracker = tracker or ExportTaskTracker(state_file=EXPORT_STATE_DIR.joinpath(
+            f"daily_gcs_{admin_level}_NO2_sample_{aoi_name}_{start_date}_to_{end_date}.json"))
+        submitted = tracker.submit(exports, resubmit=resubmit)
+        if manifest is None:
+            report_exports(tracker, exports, wait)
+            return tracker
+
+        for key in submitted:
+            manifest.record(aoi_name, key_days[key], admin_level, gcs_bucket, 'SUBMITTED',
+                            task_id=tracker.state[key]['id'], uri=key.partition('#')[0])
+        report_exports(tracker, exports, wait)
+        submitted = set(submitted)
+        for key, day in key_days.items():
+            state = tracker.state[key]['state']
+            # Also reconciles the days the tracker had as completed (e.g. exported with manifest=None)
+            if state == 'COMPLETED':
+                record_completed(aoi_name, day, admin_level, gcs_bucket, key.partition('#')[0])
+            elif key in submitted and wait:
+                manifest.record(aoi_name, day, admin_level, gcs_bucket, state)
+        return tracker
+    finally:
+        if own_manifest:
+            manifest.close()
+
+def process_monthly_no2_data_for_aoi_to_gcs(aoi, aoi_name, start_date, end_date, gcs_bucket, admin_regions=None,
+                                            tracker=None, wait=True, admin_level=None, resubmit=False):
+    """
+    See process_no2_data_for_aoi_to_drive for tracker, wait and resubmit, and
+    process_no2_data_for_aoi_to_gcs for admin_level.
+    """
+    admin_level, output_name = export_mode(aoi_name, admin_regions, admin_level)
 
-def process_monthly_no2_data_for_aoi_to_gcs(aoi, aoi_name, start_date, end_date, gcs_bucket, admin_regions=None):
     # Load NO2 ImageCollection
     NO2Collection = ee.ImageCollection("COPERNICUS/S5P/NRTI/L3_NO2").select('NO2_column_number_density')
 
@@ -328,89 +866,198 @@ def process_monthly_no2_data_for_aoi_to_gcs(aoi, aoi_name, start_date, end_date,
         final_collection = final_collection.merge(sampled_pixels_with_date)
 
     # Define the output CSV file name for the entire range
-    output_file = f"no2_{aoi_name}_{start_date.replace('-', '')}_{end_date.replace('-', '')}.csv"
+    output_file = f"no2_{output_name}_{start_date.replace('-', '')}_{end_date.replace('-', '')}.csv"
+
+    description = f"NO2_sample_{output_name}_{start_date}_to_{end_date}"
+    state_name = f"monthly_gcs_{admin_level}_NO2_sample_{aoi_name}_{start_date}_to_{end_date}"
 
     # Export the final collection to Google Cloud Storage as a single CSV file
-    export_task = ee.batch.Export.table.toCloudStorage(
-        collection=final_collection,
-        description=f"NO2_sample_{aoi_name}_{start_date}_to_{end_date}",
-        bucket=gcs_bucket,
-        fileNamePrefix=output_file.replace('.csv', ''),  # Remove '.csv' since Earth Engine adds it automatically
-        fileFormat="CSV"
-    )
-    export_task.start()
+    def export_task():
+        return ee.batch.Export.table.toCloudStorage(
+            collection=final_collection,
+            description=description,
+            bucket=gcs_bucket,
+            fileNamePrefix=output_file.replace('.csv', ''),  # Remove '.csv' since Earth Engine adds it automatically
+            fileFormat="CSV"
+        )
+
+    return run_exports({f"gs://{gcs_bucket}/{output_file}#{admin_level}": export_task}, tracker=tracker,
+                       state_file=EXPORT_STATE_DIR.joinpath(f"{state_name}.json"), wait=wait, resubmit=resubmit)
+
+
+def iter_days(start_date, end_date):
+    """Yield each day from start_date to end_date (both included) once, as 'YYYY-MM-DD'."""
+    current_date = datetime.strptime(start_date, '%Y-%m-%d')
+    end_date_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    while current_date <= end_date_dt:
+        yield current_date.strftime('%Y-%m-%d')
+        current_date += timedelta(days=1)
+
+
+NO2_RECORD_COLUMNS = ['date', 'NO2', 'longitude', 'latitude']
 
-    while export_task.active():
-        print('Exporting... Task status:', export_task.status()['state'])
-        time.sleep(30)  # Wait for 30 seconds before checking again
 
-    # Check the final status
-    status = export_task.status()
-    if status['state'] == 'COMPLETED':
-        print(f"Export completed successfully to Google Cloud Storage: {output_file}")
-    else:
-        print(f"Export failed: {status}")
+def no2_features_to_dataframe(data):
+    """Convert the getInfo() payload of sampled NO2 pixels to a DataFrame with NO2_RECORD_COLUMNS."""
+    features = data['features']
+    df = pd.DataFrame({
+        'date': [feature['properties']['date'] for feature in features],
+        'NO2': [feature['properties']['NO2_column_number_density'] for feature in features],
+        'longitude': [feature['geometry']['coordinates'][0] for feature in features],
+        'latitude': [feature['geometry']['coordinates'][1] for feature in features],
+    }, columns=NO2_RECORD_COLUMNS)
+    return df.astype({'NO2': 'float64', 'longitude': 'float64', 'latitude': 'float64'})
 
 
+class DailyRecordSink:
+    """
+    Write daily records to disk as they arrive instead of accumulating them in memory.
 
+    With file_format='parquet', output is a folder partitioned by date
+    (output/date=YYYY-MM-DD/part-0.parquet) readable with pd.read_parquet(output).
+    Each day is written atomically, so writing a day again replaces it.
+    With file_format='csv', days are appended to a single CSV file.
+    """
 
-def process_no2_data_for_aoi_to_file(aoi, start_date, end_date, aoi_name):
+    def __init__(self, output, file_format='parquet'):
+        assert file_format in ('parquet', 'csv'), 'FILE FORMAT MUST BE parquet OR csv'
+        self.output = Path(output)
+        self.file_format = file_format
+        self.rows = 0
+        self._csv = None
+
+    def write(self, date_str, df):
+        """Write the records of one day."""
+        if self.file_format == 'parquet':
+            part_dir = self.output.joinpath(f"date={date_str}")
+            part_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = part_dir.joinpath('part-0.parquet.tmp')
+            # The date is encoded in the partition folder
+            df.drop(columns='date').to_parquet(tmp_file, index=False)
+            tmp_file.replace(part_dir.joinpath('part-0.parquet'))
+        else:
+            if self._csv is None:
+                self.output.parent.mkdir(parents=True, exist_ok=True)
+                self._csv = open(self.output, 'w', newline='')
+                df.iloc[:0].to_csv(self._csv, index=False)
+            df.to_csv(self._csv, index=False, header=False)
+            # Persist each day, so a crash only loses the day in progress
+            self._csv.flush()
+        self.rows += len(df)
+
+    def close(self):
+        if self._csv is not None:
+            self._csv.close()
+            self._csv = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_daily_no2_for_dates(dates, aoi, NO2Collection):
+    """
+    getInfo() of calculate_daily_no2_for_dates, halving the dates while the result is too large.
+
+    Earth Engine refuses to return more than 5000 features in one getInfo(),
+    the days are then split into two requests (recursively).
+
+    Returns
+    -------
+    tuple
+        (list of features, number of requests made)
+    """
+    try:
+        return calculate_daily_no2_for_dates(dates, aoi, NO2Collection).getInfo()['features'], 1
+    except Exception as exc:
+        if 'accumulating over' not in str(exc) or len(dates) == 1:
+            raise
+    half = len(dates) // 2
+    first, first_requests = get_daily_no2_for_dates(dates[:half], aoi, NO2Collection)
+    second, second_requests = get_daily_no2_for_dates(dates[half:], aoi, NO2Collection)
+    return first + second, first_requests + second_requests + 1
+
+
+def daily_batches(start_date, end_date, days_per_request=10):
+    """
+    Split the days from start_date to end_date (both included) into the windows of split_dates_into_chunks.
+
+    The windows share their boundary day, here it only belongs to the next
+    window, so every day is in exactly one batch.
+    """
+    batches = [list(iter_days(chunk_start_date, chunk_end_date))[:-1] for chunk_start_date, chunk_end_date
+               in split_dates_into_chunks(start_date, end_date, chunk_size=days_per_request)]
+    if start_date <= end_date:
+        if batches and len(batches[-1]) < days_per_request:
+            batches[-1].append(end_date)
+        else:
+            batches.append([end_date])
+    return batches
+
+
+def process_no2_data_for_aoi_to_file(aoi, start_date, end_date, aoi_name, output_dir='./data/air_pollution',
+                                     file_format='csv', scheduler=None, days_per_request=10):
+    """
+    Sample daily NO2 over the AOI and write the pixels to disk day by day.
+
+    Days are requested concurrently through ``scheduler`` (an
+    EERequestScheduler, by default with 8 workers) and each day's records are
+    written in date order as soon as they arrive (see DailyRecordSink), so
+    memory stays flat and a crash keeps the days already done. With
+    file_format='csv' the output is the same single CSV as before,
+    with file_format='parquet' a folder partitioned by date.
+
+    Consecutive days are batched by days_per_request (the 10-day windows of
+    split_dates_into_chunks by default) into one server-side computation (see
+    calculate_daily_no2_for_dates) fetched with a single getInfo(), and the
+    rows, requests and latency of each batch are reported. Keep days x pixels
+    under 5000, larger batches are split automatically at the cost of extra
+    requests. Pass days_per_request=1 for one request per day.
+    """
     # Load NO2 ImageCollection
 
     NO2Collection = ee.ImageCollection("COPERNICUS/S5P/NRTI/L3_NO2") \
         .select('NO2_column_number_density')
 
-    final_df = pd.DataFrame()
+    output_name = f'no2_{aoi_name}_{start_date.replace("-","")}_{end_date.replace("-","")}'
+    if file_format == 'csv':
+        output_name += '.csv'
+    output_file = Path(output_dir).joinpath(output_name)
 
-    date_chunks = split_dates_into_chunks(start_date, end_date)
+    batches = daily_batches(start_date, end_date, days_per_request)
 
-    # Loop through each 10-day chunk and process data
-    for chunk_start_date, chunk_end_date in date_chunks:
-        print(f"Processing data from {chunk_start_date} to {chunk_end_date}...")
+    def fetch_batch(batch):
+        started = time.monotonic()
+        if len(batch) == 1:
+            data = calculate_daily_no2_for_single_day(batch[0], aoi, NO2Collection).getInfo()
+            features, n_requests = data['features'], 1
+        else:
+            features, n_requests = get_daily_no2_for_dates(batch, aoi, NO2Collection)
+        return features, n_requests, time.monotonic() - started
 
-        # Loop through each day in this 10-day chunk
-        current_date = datetime.strptime(chunk_start_date, '%Y-%m-%d')
-        end_date_dt = datetime.strptime(chunk_end_date, '%Y-%m-%d')
+    scheduler = scheduler or EERequestScheduler()
 
-        while current_date <= end_date_dt:
-            # Convert current date to string format
-            current_date_str = current_date.strftime('%Y-%m-%d')
-            
-            # Calculate NO2 for this specific day
-            sampled_pixels_with_date = calculate_daily_no2_for_single_day(current_date_str, aoi, NO2Collection)
+    with DailyRecordSink(output_file, file_format=file_format) as sink:
+        for batch, (features, n_requests, latency) in zip(batches, scheduler.imap(batches, backend=fetch_batch)):
+            df = no2_features_to_dataframe({'features': features})
+            by_day = dict(tuple(df.groupby('date', sort=False))) if len(batch) > 1 else {batch[0]: df}
+            # Write each day's results out straight away
+            for current_date_str in batch:
+                sink.write(current_date_str, by_day.get(current_date_str, df.iloc[:0]))
+            print(f"Processed {batch[0]} to {batch[-1]}: {len(df)} records, {n_requests} request(s), "
+                  f"{latency:.1f}s")
 
-            # Get the results as a Python dictionary and convert it to a DataFrame
-            data = sampled_pixels_with_date.getInfo()
-            features = data['features']
-
-            # Extract the NO2, date, and coordinates for each pixel
-            records = []
-            for feature in features:
-                props = feature['properties']
-                coords = feature['geometry']['coordinates']
-                records.append({
-                    'date': props['date'],
-                    'NO2': props['NO2_column_number_density'],
-                    'longitude': coords[0],
-                    'latitude': coords[1]
-                })
-
-            # Convert the list of records to a DataFrame
-            df = pd.DataFrame(records)
-            
-            # Concatenate the results into the final DataFrame
-            final_df = pd.concat([final_df, df], ignore_index=True)
-            
-            # Move to the next day
-            current_date += timedelta(days=1)
-
-    # Write final DataFrame to CSV file using the original start and end dates
-    output_file = f'./data/air_pollution/no2_{aoi_name}_{start_date.replace("-","")}_{end_date.replace("-","")}.csv'
-    final_df.to_csv(output_file, index=False)
-    print(f"Data saved to {output_file}")
+    print(f"Data saved to {output_file} ({sink.rows} records)")
+    return output_file
 
 # Loop through each month and calculate the native resolution monthly average
-def process_monthly_no2_at_native_resolution(aoi, start_date, end_date, gcs_bucket, aoi_name):
+def process_monthly_no2_at_native_resolution(aoi, start_date, end_date, gcs_bucket, aoi_name, tracker=None,
+                                             wait=True, resubmit=False):
+    """
+    See process_no2_data_for_aoi_to_drive for tracker, wait and resubmit.
+    """
     # Load NO2 ImageCollection
     NO2Collection = ee.ImageCollection("COPERNICUS/S5P/NRTI/L3_NO2").select('NO2_column_number_density')
 
@@ -442,51 +1089,51 @@ def process_monthly_no2_at_native_resolution(aoi, start_date, end_date, gcs_buck
     # Define the output CSV file name for the entire range
     output_file = f"no2_native_{aoi_name}_{start_date.replace('-', '')}_{end_date.replace('-', '')}.csv"
 
-    # Export the final collection to Google Cloud Storage as a single CSV file
-    export_task = ee.batch.Export.table.toCloudStorage(
-        collection=final_collection,
-        description=f"NO2_sample_{aoi_name}_native_{start_date}_to_{end_date}",
-        bucket=gcs_bucket,
-        fileNamePrefix=output_file.replace('.csv', ''),  # Remove '.csv' since Earth Engine adds it automatically
-        fileFormat="CSV"
-    )
-    export_task.start()
+    description = f"NO2_sample_{aoi_name}_native_{start_date}_to_{end_date}"
+    state_name = f"native_gcs_{description}"
 
-    while export_task.active():
-        print('Exporting native resolution data... Task status:', export_task.status()['state'])
-        time.sleep(30)  # Wait for 30 seconds before checking again
+    # Export the final collection to Google Cloud Storage as a single CSV file
+    def export_task():
+        return ee.batch.Export.table.toCloudStorage(
+            collection=final_collection,
+            description=description,
+            bucket=gcs_bucket,
+            fileNamePrefix=output_file.replace('.csv', ''),  # Remove '.csv' since Earth Engine adds it automatically
+            fileFormat="CSV"
+        )
 
-    # Check the final status
-    status = export_task.status()
-    if status['state'] == 'COMPLETED':
-        print(f"Export completed successfully to Google Cloud Storage: {output_file}")
-    else:
-        print(f"Export failed: {status}")
+    return run_exports({f"gs://{gcs_bucket}/{output_file}": export_task}, tracker=tracker,
+                       state_file=EXPORT_STATE_DIR.joinpath(f"{state_name}.json"), wait=wait, resubmit=resubmit)
 
 
-import geopandas as gpd
+if __name__ == "__main__":
+    # Authenticate and initialize Earth Engine
+    ee.Authenticate()
+    ee.Initialize()
+    import geemap
+    import geopandas as gpd
 
-ethiopia = gpd.read_file("data/boundaries/eth_admbnda_adm1_csa_bofedb_2021.shp")
-addis = ethiopia[ethiopia['ADM1_EN']=='Addis Ababa']
-tigray = ethiopia[ethiopia['ADM1_EN']=='Tigray']
+    ethiopia = gpd.read_file("data/boundaries/eth_admbnda_adm1_csa_bofedb_2021.shp")
+    addis = ethiopia[ethiopia['ADM1_EN']=='Addis Ababa']
+    tigray = ethiopia[ethiopia['ADM1_EN']=='Tigray']
 
-ethiopia_adm0 = gpd.read_file('data/boundaries/eth_admbnda_adm0_csa_bofedb_itos_2021.shp')
-ethiopia_adm1 = gpd.read_file('data/boundaries/eth_admbnda_adm1_csa_bofedb_2021.shp')
-ethiopia_adm3 = gpd.read_file('data/boundaries/eth_admbnda_adm3_csa_bofedb_2021.shp')
-djibouti_addis = gpd.read_file('data/boundaries/ethiopia_adm3_djibouti_addis_outline.shp')
+    ethiopia_adm0 = gpd.read_file('data/boundaries/eth_admbnda_adm0_csa_bofedb_itos_2021.shp')
+    ethiopia_adm1 = gpd.read_file('data/boundaries/eth_admbnda_adm1_csa_bofedb_2021.shp')
+    ethiopia_adm3 = gpd.read_file('data/boundaries/eth_admbnda_adm3_csa_bofedb_2021.shp')
+    djibouti_addis = gpd.read_file('data/boundaries/ethiopia_adm3_djibouti_addis_outline.shp')
 
-admin_regions_ee = geemap.geopandas_to_ee(djibouti_addis)
+    admin_regions_ee = geemap.geopandas_to_ee(djibouti_addis)
 
-start_date = '2024-05-11'
-end_date = '2024-05-12'
+    start_date = '2024-05-11'
+    end_date = '2024-05-12'
 
 
-aoi = geemap.geopandas_to_ee(djibouti_addis)
+    aoi = geemap.geopandas_to_ee(djibouti_addis)
 
-process_no2_data_for_aoi_to_gcs(
-    aoi=aoi,
-    aoi_name='djibouti_addis',
-    start_date=start_date,
-    end_date=end_date,
-    gcs_bucket='datalab-air-pollution'
-)
\ No newline at end of file
+    process_no2_data_for_aoi_to_gcs(
+        aoi=aoi,
+        aoi_name='djibouti_addis',
+        start_date=start_date,
+        end_date=end_date,
+        gcs_bucket='datalab-air-pollution'
+    )
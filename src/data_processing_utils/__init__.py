@@ -1,3 +1,5 @@
+import os
+from importlib import import_module
 from importlib.metadata import version, PackageNotFoundError
 
 try:
@@ -5,3 +7,30 @@ try:
 except PackageNotFoundError:
     # package is not installed
     pass
+
+os.environ["USE_PYGEOS"] = "0"
+
+# Submodules are only imported on first access (PEP 562)
+_SUBMODULES = {
+    "boundaries",
+    "dataframe_utils",
+    "distances",
+    "geoprocessing_utils",
+    "market_access",
+    "osm",
+    "projections",
+    "rasters",
+    "s3",
+    "vectors",
+    "zonal_stats",
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -0,0 +1,89 @@
+"""
+Admin boundaries from the geoBoundaries API with a local GeoParquet cache.
+"""
+import os
+from pathlib import Path
+
+import geopandas as gpd
+import requests
+from pyproj import CRS as ProjCRS
+from pyproj.exceptions import CRSError
+
+
+GEOBOUNDARIES_CACHE_DIR = Path(os.environ.get(
+    "GEOBOUNDARIES_CACHE_DIR", Path.home().joinpath(".cache", "geoboundaries")))
+
+
+def _geoboundaries_crs(geom_json):
+    """EPSG code or CRS string of a geoBoundaries GeoJSON, defaulting to WGS84."""
+    try:
+        crs_name = geom_json['crs']['properties']['name']
+    except (KeyError, TypeError):
+        return 4326
+    if crs_name.split(":")[-1] == 'CRS84':
+        return 4326
+    try:
+        return ProjCRS.from_user_input(crs_name).to_string()
+    except CRSError:
+        print('Please manually check CRS, now defaulting to WGS-84')
+        return 4326
+
+
+def get_geoboundaries_adm_layer(co_iso='MWI', admin_level=0, release_type="gbOpen",
+                                cache_dir=None, refresh=False,
+                                base_url="https://www.geoboundaries.org/api/current/"):
+    """
+    Retrieves admin boundaries for country from https://www.geoboundaries.org/api.html API.
+
+    Downloaded boundaries are stored as GeoParquet in a local cache keyed by
+    (release type, ISO3 code, admin level), so later calls read from disk.
+
+    Parameters
+    ----------
+    co_iso(str) - Country ISO3 code, for example MWI
+    admin_level(int) - Admin level provided as an integer
+    release_type(str) - gbOpen, gbHumanitarian or gbAuthoritative
+    cache_dir(str) - Folder of the boundary cache, defaults to the GEOBOUNDARIES_CACHE_DIR
+                     environment variable or ~/.cache/geoboundaries
+    refresh(bool) - Download again even if the boundaries are in the cache
+    base_url(str) - Root URL of the API, e.g. a local server for testing
+
+    Returns
+    -------
+    A Geopandas GeoDataframe
+    """
+
+    assert len(co_iso) == 3, 'PLEASE PROVIDE A VALID ISO CODE FOR THE COUNTRY'
+    assert admin_level < 10, 'PLEASE PROVIDE A VALID ADMIN LEVEL NUMBER'
+
+    co_iso = co_iso.upper()
+    admin_lev_str = f"ADM{admin_level}"
+    cache_file = Path(cache_dir or GEOBOUNDARIES_CACHE_DIR).joinpath(
+        release_type, co_iso, f"{co_iso}_{admin_lev_str}.parquet")
+    if cache_file.exists() and not refresh:
+        return gpd.read_parquet(cache_file)
+
+    # ==========================================
+    # LOAD GEOBOUNDARY JSON OBJECT
+    # ==========================================
+    target_url = f"{base_url.rstrip('/')}/{release_type}/{co_iso}/{admin_lev_str}/"
+    r = requests.get(target_url, timeout=60)
+    r.raise_for_status()
+    meta = r.json()
+    # The API returns a list when several boundaries match the query
+    if isinstance(meta, list):
+        meta = meta[0]
+    geom_json = requests.get(meta['gjDownloadURL'], timeout=300).json()
+
+    # ==========================================
+    # CONVERT JSON INTO GEOPANDAS DATAFRAME
+    # ==========================================
+    gdf = gpd.GeoDataFrame.from_features(geom_json['features'], crs=_geoboundaries_crs(geom_json))
+
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first so an interrupted write never leaves a broken cache entry
+    tmp_file = cache_file.with_name(cache_file.name + '.tmp')
+    gdf.to_parquet(tmp_file)
+    tmp_file.replace(cache_file)
+
+    return gdf
@@ -1,5 +1,4 @@
 import pandas as pd
-from IPython.display import display
 
 def pretty_print_value_counts(df, column, title=None):
     """
@@ -20,6 +19,9 @@ def pretty_print_value_counts(df, column, title=None):
     None
         Displays a styled DataFrame with counts and percentages.
     """
+    # Imported here so that the module can be used without IPython installed
+    from IPython.display import display
+
     # Calculate the value counts and convert to DataFrame
     count_df = pd.DataFrame(df[column].value_counts(normalize=False).reset_index())
     count_df.columns = ['Category', 'Count']
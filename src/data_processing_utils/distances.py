@@ -0,0 +1,561 @@
+"""
+Great-circle distances, nearest-point queries and destination points.
+
+Only NumPy and Pandas are imported at module load, the geospatial stack
+(geopandas, scipy, shapely, pyproj) is imported by the functions needing it.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def distance_between_points(pt1=None, pt2=None):
+    """
+    Calculate the Haversine distance betweeen 2 points.
+
+    Parameters
+    ----------
+    pt1 : tuple of float
+        (lat, long)
+    pt2 : tuple of float
+        (lat, long)
+
+    Returns
+    -------
+    distance_in_km : float
+
+    Examples
+    --------
+    >>> pt1 = (48.1372, 11.5756)  # Munich
+    >>> pt2 = (52.5186, 13.4083)  # Berlin
+    >>> round(distance_between_points(pt1, pt2), 1)
+    504.2
+    """
+    lat1, lon1 = pt1
+    lat2, lon2 = pt2
+    radius = 6371  # km
+
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon / 2) * math.sin(dlon / 2))
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    d = radius * c
+
+    return d
+
+
+def haversine_distances(lat1, lon1, lat2, lon2, radius=6371):
+    """
+    Vectorized Haversine distance using NumPy broadcasting.
+
+    Inputs can be scalars, lists, NumPy arrays or Pandas Series and are
+    broadcast against each other, so one-to-many works out of the box.
+    For many-to-many, pass column/row shaped arrays (e.g. ``lat1[:, None]``)
+    or use :func:`haversine_matrix` which also chunks the work.
+
+    Parameters
+    ----------
+    lat1, lon1 : float or array-like
+        Latitude and longitude of the first point(s) in decimal degrees.
+    lat2, lon2 : float or array-like
+        Latitude and longitude of the second point(s) in decimal degrees.
+    radius : float, optional
+        Radius of the sphere, defaults to mean radius of earth in km.
+
+    Returns
+    -------
+    numpy.ndarray
+        Distances with the broadcast shape of the inputs.
+
+    Examples
+    --------
+    >>> round(float(haversine_distances(48.1372, 11.5756, 52.5186, 13.4083)), 1)
+    504.2
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    # Clip guards against tiny floating point overshoots above 1
+    return 2 * radius * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine_matrix(lats1, lons1, lats2, lons2, radius=6371, chunk_size=2048):
+    """
+    Many-to-many Haversine distances computed in row chunks.
+
+    Only ``chunk_size x len(lats2)`` temporaries are held in memory at any
+    time on top of the output array.
+
+    Parameters
+    ----------
+    lats1, lons1 : array-like
+        Origin coordinates in decimal degrees (N points).
+    lats2, lons2 : array-like
+        Destination coordinates in decimal degrees (M points).
+    radius : float, optional
+        Radius of the sphere, defaults to mean radius of earth in km.
+    chunk_size : int, optional
+        Number of origin rows processed per chunk.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (N, M) with distances.
+    """
+    lats1 = np.asarray(lats1, dtype=np.float64).ravel()
+    lons1 = np.asarray(lons1, dtype=np.float64).ravel()
+    lats2 = np.asarray(lats2, dtype=np.float64).ravel()
+    lons2 = np.asarray(lons2, dtype=np.float64).ravel()
+
+    out = np.empty((lats1.size, lats2.size), dtype=np.float64)
+    for start in range(0, lats1.size, chunk_size):
+        stop = start + chunk_size
+        out[start:stop] = haversine_distances(lats1[start:stop, None], lons1[start:stop, None],
+                                              lats2[None, :], lons2[None, :], radius=radius)
+    return out
+
+
+def _lat_lon_to_unit_xyz(lats, lons):
+    """Convert decimal degree coordinates to 3D points on the unit sphere."""
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lats)
+    return np.column_stack([cos_lat * np.cos(lons), cos_lat * np.sin(lons), np.sin(lats)])
+
+
+class NearestPointIndex:
+    """
+    Reusable nearest-neighbour index over a set of destination points.
+
+    Points are stored as 3D unit vectors in a KD-tree so that straight-line
+    (chord) distance orders points exactly like great-circle distance. Build
+    it once, e.g. from all markets, and query it with all villages in bulk.
+    Returned distances are great-circle distances in km.
+
+    Parameters
+    ----------
+    dest_pts : pandas.DataFrame, geopandas.GeoDataFrame or list
+        Destination points. A GeoDataFrame of points is used through its
+        geometry (reprojected to EPSG:4326 if needed). A list should look
+        like [(lat,lon)] or [(lat,lon,id)] as in distance_to_points.
+    lon_col(str) - Column with longitude values
+    lat_col(str) - Column with latitude values
+    id_col (str) - Optional column with point ids returned by ``query_ids``
+    radius : float, optional
+        Radius of the sphere, defaults to mean radius of earth in km.
+
+    Examples
+    --------
+    >>> idx = NearestPointIndex([(48.1372, 11.5756, 'munich'), (52.5186, 13.4083, 'berlin')],
+    ...                         id_col='id')
+    >>> dist, pos = idx.query([52.0], [13.0])
+    >>> idx.ids[pos[0]]
+    'berlin'
+    """
+
+    def __init__(self, dest_pts, lon_col='lon', lat_col='lat', id_col=None, radius=6371):
+        import geopandas as gpd
+        from scipy.spatial import cKDTree
+
+        if isinstance(dest_pts, gpd.GeoDataFrame):
+            gdf = dest_pts
+            if gdf.crs is not None and not gdf.crs.is_geographic:
+                gdf = gdf.to_crs(4326)
+            lats, lons = gdf.geometry.y.values, gdf.geometry.x.values
+            df = gdf
+        elif isinstance(dest_pts, pd.DataFrame):
+            df = dest_pts
+            lats, lons = df[lat_col].values, df[lon_col].values
+        else:
+            if len(dest_pts[0]) == 3:
+                df = pd.DataFrame(dest_pts, columns=[lat_col, lon_col, id_col or 'id'])
+                id_col = id_col or 'id'
+            else:
+                df = pd.DataFrame(dest_pts, columns=[lat_col, lon_col])
+            lats, lons = df[lat_col].values, df[lon_col].values
+
+        self.radius = radius
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.ids = np.asarray(df[id_col]) if id_col is not None else np.arange(len(df))
+        self.tree = cKDTree(_lat_lon_to_unit_xyz(self.lats, self.lons))
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _chord_to_km(self, chord):
+        # Unmatched neighbours come back from the tree with an infinite chord
+        dist = 2 * self.radius * np.arcsin(np.clip(chord / 2, 0, 1))
+        return np.where(np.isinf(chord), np.inf, dist)
+
+    def _km_to_chord(self, dist_km):
+        return 2 * np.sin(np.clip(dist_km / (2 * self.radius), 0, np.pi / 2))
+
+    def query(self, lats, lons, k=1, max_distance=None, workers=1):
+        """
+        Find the k nearest destination points for many target points at once.
+
+        Parameters
+        ----------
+        lats, lons : array-like
+            Target coordinates in decimal degrees.
+        k : int, optional
+            Number of neighbours to return.
+        max_distance : float, optional
+            Ignore neighbours further than this (km). Missing neighbours get
+            distance ``inf`` and position ``len(index)``.
+        workers : int, optional
+            Number of threads used by the KD-tree, -1 uses all cores.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            (distances in km, positions into the destination points), each
+            of shape (n,) when k == 1, else (n, k).
+        """
+        xyz = _lat_lon_to_unit_xyz(np.atleast_1d(lats), np.atleast_1d(lons))
+        upper = np.inf if max_distance is None else self._km_to_chord(max_distance)
+        chord, pos = self.tree.query(xyz, k=k, distance_upper_bound=upper, workers=workers)
+        return self._chord_to_km(chord), pos
+
+    def query_ids(self, lats, lons, max_distance=None, workers=1):
+        """Return the id and distance (km) of the nearest destination point for each target."""
+        dist, pos = self.query(lats, lons, k=1, max_distance=max_distance, workers=workers)
+        ids = np.full(len(pos), None, dtype=object)
+        found = pos < len(self)
+        ids[found] = self.ids[pos[found]]
+        return ids, dist
+
+    def query_radius(self, lats, lons, distance, workers=1):
+        """
+        Find all destination points within a great-circle distance of each target.
+
+        Parameters
+        ----------
+        lats, lons : array-like
+            Target coordinates in decimal degrees.
+        distance : float
+            Search radius in km.
+        workers : int, optional
+            Number of threads used by the KD-tree, -1 uses all cores.
+
+        Returns
+        -------
+        tuple of lists
+            (positions, distances) with one array per target point, sorted by distance.
+        """
+        lats, lons = np.atleast_1d(lats), np.atleast_1d(lons)
+        xyz = _lat_lon_to_unit_xyz(lats, lons)
+        hits = self.tree.query_ball_point(xyz, r=self._km_to_chord(distance), workers=workers)
+        positions, distances = [], []
+        for i, pos in enumerate(hits):
+            pos = np.asarray(pos, dtype=np.intp)
+            dist = haversine_distances(lats[i], lons[i], self.lats[pos], self.lons[pos],
+                                       radius=self.radius)
+            order = np.argsort(dist)
+            positions.append(pos[order])
+            distances.append(dist[order])
+        return positions, distances
+
+
+def iter_haversine_blocks(lats1, lons1, lats2=None, lons2=None, block_size=1024,
+                          radius=6371, dtype=np.float32):
+    """
+    Yield the Haversine distance matrix tile by tile.
+
+    When no destination points are given the matrix is symmetric and only
+    tiles on or above the diagonal are produced.
+
+    Parameters
+    ----------
+    lats1, lons1 : array-like
+        Origin coordinates in decimal degrees (N points).
+    lats2, lons2 : array-like, optional
+        Destination coordinates in decimal degrees (M points). Defaults to the origins.
+    block_size : int, optional
+        Edge length of the square tiles.
+    radius : float, optional
+        Radius of the sphere, defaults to mean radius of earth in km.
+    dtype : numpy.dtype, optional
+        Data type of the returned tiles.
+
+    Yields
+    ------
+    tuple
+        (row_start, col_start, tile) where tile has shape at most (block_size, block_size).
+    """
+    symmetric = lats2 is None
+    lats1 = np.asarray(lats1, dtype=np.float64).ravel()
+    lons1 = np.asarray(lons1, dtype=np.float64).ravel()
+    if symmetric:
+        lats2, lons2 = lats1, lons1
+    else:
+        lats2 = np.asarray(lats2, dtype=np.float64).ravel()
+        lons2 = np.asarray(lons2, dtype=np.float64).ravel()
+
+    for i0 in range(0, lats1.size, block_size):
+        i1 = i0 + block_size
+        for j0 in range(i0 if symmetric else 0, lats2.size, block_size):
+            j1 = j0 + block_size
+            tile = haversine_distances(lats1[i0:i1, None], lons1[i0:i1, None],
+                                       lats2[None, j0:j1], lons2[None, j0:j1], radius=radius)
+            yield i0, j0, tile.astype(dtype, copy=False)
+
+
+def distance_matrix(xy_list=None, chunk_size=2048, output='dataframe', dest_xy_list=None,
+                    out_file=None, max_distance=None):
+    """
+    Return distance matrix from a dictlist of xy coordinates
+    :param xy_list: list of namedtuples with point_id, x and y
+    :param chunk_size: number of rows computed at once, also the tile size for the
+        condensed, memmap and sparse outputs
+    :param output: dataframe-a dataframe style of distance matrix; condensed-float32 array
+        of the upper triangle (i < j) in the same order as scipy's pdist; memmap-float32
+        (N, M) matrix written tile by tile to out_file (.npy); sparse-tuple of
+        (row, col, dist) arrays for pairs with dist <= max_distance, each pair once (row < col)
+        when there are no destination points
+    :param dest_xy_list: optional destination points, the matrix is then xy_list x dest_xy_list
+        (not available for the condensed output)
+    :param out_file: path of the .npy file for the memmap output
+    :param max_distance: distance cutoff in km for the sparse output
+    :return: a dataframe, numpy array, numpy memmap or tuple of arrays depending on output
+    """
+    df = pd.DataFrame([dict(d._asdict()) for d in xy_list])
+    dest_df = df if dest_xy_list is None else pd.DataFrame([dict(d._asdict()) for d in dest_xy_list])
+
+    # Same argument order as distance_between_points(pt1=(x, y), pt2=(pt.x, pt.y))
+    if output == 'dataframe':
+        dist = haversine_matrix(df['x'].values, df['y'].values,
+                                dest_df['x'].values, dest_df['y'].values, chunk_size=chunk_size)
+        colnames = ['to_' + str(pt_id) for pt_id in dest_df['point_id']]
+        dist_df = pd.DataFrame(dist, columns=colnames, index=df.index)
+        return pd.concat([df, dist_df], axis=1)
+
+    symmetric = dest_xy_list is None
+    blocks = iter_haversine_blocks(df['x'].values, df['y'].values,
+                                   None if symmetric else dest_df['x'].values,
+                                   None if symmetric else dest_df['y'].values,
+                                   block_size=chunk_size)
+    n, m = len(df), len(dest_df)
+
+    if output == 'condensed':
+        assert symmetric, 'CONDENSED OUTPUT IS ONLY AVAILABLE FOR A SINGLE SET OF POINTS'
+        condensed = np.empty(n * (n - 1) // 2, dtype=np.float32)
+        for i0, j0, tile in blocks:
+            ii, jj = np.indices(tile.shape).reshape(2, -1)
+            ii, jj = ii + i0, jj + j0
+            upper = jj > ii
+            ii, jj = ii[upper], jj[upper]
+            condensed[n * ii - ii * (ii + 1) // 2 + jj - ii - 1] = tile[ii - i0, jj - j0]
+        return condensed
+    elif output == 'memmap':
+        assert out_file is not None, 'PLEASE PROVIDE out_file FOR THE MEMMAP OUTPUT'
+        mm = np.lib.format.open_memmap(out_file, mode='w+', dtype=np.float32, shape=(n, m))
+        for i0, j0, tile in blocks:
+            mm[i0:i0 + tile.shape[0], j0:j0 + tile.shape[1]] = tile
+            if symmetric:
+                mm[j0:j0 + tile.shape[1], i0:i0 + tile.shape[0]] = tile.T
+        mm.flush()
+        return mm
+    elif output == 'sparse':
+        assert max_distance is not None, 'PLEASE PROVIDE max_distance FOR THE SPARSE OUTPUT'
+        rows, cols, dists = [], [], []
+        for i0, j0, tile in blocks:
+            keep = tile <= max_distance
+            if symmetric:
+                # Each unordered pair once, without the zero self-distances
+                keep &= np.arange(j0, j0 + tile.shape[1]) > np.arange(i0, i0 + tile.shape[0])[:, None]
+            ii, jj = np.nonzero(keep)
+            rows.append(ii + i0)
+            cols.append(jj + j0)
+            dists.append(tile[ii, jj])
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(dists)
+    else:
+        raise ValueError("output must be one of 'dataframe', 'condensed', 'memmap' or 'sparse'")
+
+
+def distance_to_points(dest_pts, target_pt, lon_col='lon', lat_col='lat', 
+                       id_col='id', output='nearest'):
+    """
+    Measure distance from target_pt to all points in dest_pts.
+    Parameters
+    ----------
+    dest_pts - Either a list or a Pandas Dataframe. If a list, it should be a lilike this:  [(lat,lon)] or [(lat,lon,id)]
+              or a prebuilt NearestPointIndex, which avoids recomputing all distances for nearest/nearest_id
+    target_pt(tuple) - A target point to measure distance from provided as a (lat,lon)
+    lon_col(str) - Column with longitude values
+    lat_col(str) - Column with latitude values
+    id_col (str) - Column with row id if interested in returning nearest point id
+    output - nearest-output distance to nearest point; nearest_id-output id of nearest point; dist_list-output distance list.
+
+    Returns A list containing floats
+    -------
+    """
+    if isinstance(dest_pts, NearestPointIndex):
+        if output == 'nearest':
+            return dest_pts.query(target_pt[0], target_pt[1])[0][0]
+        elif output == 'nearest_id':
+            return dest_pts.query_ids(target_pt[0], target_pt[1])[0][0]
+        dist = haversine_distances(dest_pts.lats, dest_pts.lons, target_pt[0], target_pt[1],
+                                   radius=dest_pts.radius)
+        return list(dist)
+
+    if isinstance(dest_pts, pd.DataFrame):
+        df = dest_pts
+    else:
+        if len(dest_pts[0]) == 3:
+            df = pd.DataFrame(dest_pts, columns=[lat_col, lon_col, id_col])
+        else:
+            df = pd.DataFrame(dest_pts, columns=[lat_col, lon_col])
+    dist = haversine_distances(df[lat_col].values, df[lon_col].values,
+                               target_pt[0], target_pt[1])
+    if output == 'nearest':
+        return np.nanmin(dist)
+    elif output == 'nearest_id':
+        try:
+            return df[id_col].iloc[int(np.nanargmin(dist))]
+        except KeyError:
+            print('Make sure you provided ID column')
+    elif output == 'dist_list':
+        return list(dist)
+    else:
+        return list(dist)
+
+
+def terminal_coordinates(origin_coords, bearing, distance, return_degrees=True):
+    """Calculates end coordinates in decimal degrees given initial/origin coordinates in decimal degrees.
+
+    Parameters
+    ----------
+    origin_coords : tuple
+        Initial coordinates in decimal degrees given as a lon,lat tuple.
+    bearing : float
+        Bearings or azimuths (in degrees) start with 0 degrees toward true north, 90 degrees east, 
+        180 degrees south, and 270 degrees west (clockwise rotation)
+    distance : int
+        Distance in meters.
+    return_degrees : Boolean, default = True
+        Whether to return new point in degrees or meters (UTM zone of the origin)
+
+    Returns
+    ----------
+    Tuple
+        New coordinates as a (lon,lat) tuple
+    """
+    from pyproj import Transformer
+
+    from .projections import convert_wgs_coordinates_to_utm
+
+    lon, lat = terminal_coordinates_array(origin_coords[1], origin_coords[0],
+                                          distance / 1000, bearing)
+    if return_degrees:
+        return float(lon), float(lat)
+
+    # get projected CRS EPSG code
+    utm_crs_epsg = int(convert_wgs_coordinates_to_utm(
+        origin_coords[0], origin_coords[1]))
+    transformer = Transformer.from_crs(4326, utm_crs_epsg, always_xy=True)
+    x_new, y_new = transformer.transform(lon, lat)
+    return float(x_new), float(y_new)
+
+
+def terminal_coordinates_array(lat1, lon1, d, bearing, R=6371):
+    """
+    Vectorized version of terminal_coordinates_faster.
+
+    All inputs can be scalars, NumPy arrays or Pandas Series and are broadcast
+    against each other. For example, rings for many points at many distances
+    and bearings can be computed in one call with ``lat1[:, None, None]``,
+    ``d[None, :, None]`` and ``bearing[None, None, :]``.
+
+    Parameters
+    ----------
+    lat1 : float or array-like
+        Initial latitude, in degrees
+    lon1 : float or array-like
+        Initial longitude, in degrees
+    d : float or array-like
+        Target distance from initial, same unit as R
+    bearing : float or array-like
+        (True) heading in degrees
+    R : float, optional
+        Radius of sphere, defaults to mean radius of earth in km
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        New (lon, lat) coordinates in degrees with the broadcast shape of the inputs
+    """
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    a = np.radians(np.asarray(bearing, dtype=np.float64))
+    delta = np.asarray(d, dtype=np.float64) / R
+
+    sin_lat1, cos_lat1 = np.sin(lat1), np.cos(lat1)
+    sin_delta, cos_delta = np.sin(delta), np.cos(delta)
+    lat2 = np.arcsin(sin_lat1 * cos_delta + cos_lat1 * sin_delta * np.cos(a))
+    lon2 = lon1 + np.arctan2(
+        np.sin(a) * sin_delta * cos_lat1,
+        cos_delta - sin_lat1 * np.sin(lat2)
+    )
+    return np.degrees(lon2), np.degrees(lat2)
+
+
+def terminal_coordinates_faster(lat1, lon1, d, bearing, R=6371):
+    """
+    lat: initial latitude, in degrees
+    lon: initial longitude, in degrees
+    d: target distance from initial
+    bearing: (true) heading in degrees
+    R: optional radius of sphere, defaults to mean radius of earth
+
+    Returns new lat/lon coordinate {d}km from initial, in degrees
+    """
+    lon2, lat2 = terminal_coordinates_array(lat1, lon1, d, bearing, R=R)
+    return float(lon2), float(lat2)
+
+
+def geodesic_buffers(lats, lons, distance, n_bearings=64, R=6371):
+    """
+    Build geodesic buffer polygons around many points at once.
+
+    Each buffer is the polygon through the points at ``distance`` from the
+    centre along ``n_bearings`` evenly spaced bearings, so buffers keep their
+    true size on the ground irrespective of latitude. Buffers crossing the
+    antimeridian or containing a pole are not handled.
+
+    Parameters
+    ----------
+    lats, lons : array-like
+        Centre coordinates in decimal degrees.
+    distance : float or array-like
+        Buffer radius, same unit as R (km by default). An array gives one radius per point.
+    n_bearings : int, optional
+        Number of vertices per buffer.
+    R : float, optional
+        Radius of sphere, defaults to mean radius of earth in km
+
+    Returns
+    -------
+    geopandas.GeoSeries
+        Buffer polygons in EPSG:4326, aligned with the input points.
+    """
+    import geopandas as gpd
+    import shapely
+
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+    distance = np.broadcast_to(np.asarray(distance, dtype=np.float64), lats.shape)
+    bearings = np.linspace(0, 360, n_bearings, endpoint=False)
+
+    ring_lon, ring_lat = terminal_coordinates_array(lats[:, None], lons[:, None],
+                                                    distance[:, None], bearings[None, :], R=R)
+    polygons = shapely.polygons(np.stack([ring_lon, ring_lat], axis=-1))
+    return gpd.GeoSeries(polygons, crs=4326)
@@ -0,0 +1,170 @@
+"""
+Travel time (market access) surfaces from a friction raster with skimage.graph.MCP_Geometric.
+
+Adapted from https://github.com/worldbank/INFRA_SAP/blob/master/infrasap/market_access.py
+"""
+import math
+
+import numpy as np
+import rasterio
+import skimage.graph as graph
+from rasterio.transform import rowcol
+from rasterio.windows import Window
+
+from .zonal_stats import zonal_stats_for_rasters
+
+
+def _destination_cells(destinations, src):
+    """Row/col of destination points inside the raster, in the raster CRS."""
+    geoms = destinations.geometry
+    if src.crs and geoms.crs and geoms.crs != src.crs:
+        geoms = geoms.to_crs(src.crs)
+    rows, cols = rowcol(src.transform, geoms.x.values, geoms.y.values)
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    inside = (rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width)
+    return rows[inside], cols[inside]
+
+
+class _MCPCutoff(graph.MCP_Geometric):
+    """MCP_Geometric stopping as soon as the cheapest unvisited pixel costs more than max_cost."""
+
+    def __init__(self, costs, max_cost):
+        super().__init__(costs, fully_connected=True)
+        self.max_cost = max_cost
+
+    def goal_reached(self, index, cumcost):
+        # Pixels are visited by increasing cumulative cost, so all remaining ones are further
+        return 2 if cumcost > self.max_cost else 0
+
+
+def _cumulative_cost(friction, rows, cols, max_cost=None):
+    """Multi-source cumulative cost from all destination cells in a single MCP run."""
+    if len(rows) == 0:
+        return np.full(friction.shape, np.inf, dtype=np.float32)
+    if max_cost is None:
+        mcp = graph.MCP_Geometric(friction, fully_connected=True)
+    else:
+        mcp = _MCPCutoff(friction, max_cost)
+    costs, _ = mcp.find_costs(list(zip(rows.tolist(), cols.tolist())))
+    costs = costs.astype(np.float32)
+    if max_cost is not None:
+        costs[costs > max_cost] = np.inf
+    return costs
+
+
+def travel_time_surface(friction_tif, destinations, out_tif, max_cost=None, tile_size=None, band=1):
+    """
+    Travel time from every pixel to the nearest destination (e.g. market or city).
+
+    All destinations are seeded into one MCP_Geometric run, so the cost of
+    reaching the nearest one is found in a single pass instead of one run
+    per destination. Friction values are the cost of crossing one pixel
+    (e.g. minutes), diagonal moves cost sqrt(2) times more. Nodata, zero,
+    negative and infinite friction pixels are impassable.
+
+    Parameters
+    ----------
+    friction_tif : str
+        Path to the friction raster
+    destinations : gpd.GeoDataFrame or gpd.GeoSeries
+        Destination points, reprojected to the raster CRS when needed
+    out_tif : str
+        Path of the output travel time raster (float32, inf where unreachable)
+    max_cost : float, optional
+        Stop expanding beyond this travel time, pixels further away are set to inf
+    tile_size : int, optional
+        Process the raster in tiles of this size. Requires max_cost: each tile
+        is extended by the largest distance (in pixels) a path of cost max_cost
+        can cover, so that tiled results are identical to a single run.
+    band : int, optional
+        Band of the friction raster
+
+    Returns
+    -------
+    str
+        out_tif
+    """
+    with rasterio.open(friction_tif) as src:
+        profile = src.profile.copy()
+        profile.update({'driver': 'GTiff', 'dtype': 'float32', 'count': 1, 'nodata': None,
+                        'tiled': True, 'blockxsize': 256, 'blockysize': 256, 'compress': 'deflate',
+                        'BIGTIFF': 'IF_SAFER'})
+        rows, cols = _destination_cells(destinations, src)
+
+        def read_friction(window=None):
+            friction = src.read(band, window=window, masked=True).astype(np.float64).filled(-1)
+            # Free pixels would let paths reach beyond the tile halo, MCP skips negative costs
+            friction[friction <= 0] = -1
+            return friction
+
+        with rasterio.open(out_tif, 'w', **profile) as dst:
+            if tile_size is None:
+                dst.write(_cumulative_cost(read_friction(), rows, cols, max_cost), 1)
+                return out_tif
+
+            assert max_cost is not None, 'PLEASE PROVIDE max_cost TO RUN TILED'
+            # Cheapest pixel crossing over the whole raster bounds how far a path can reach
+            min_friction = np.inf
+            for _, window in src.block_windows(band):
+                friction = read_friction(window)
+                passable = friction[(friction > 0) & np.isfinite(friction)]
+                if passable.size:
+                    min_friction = min(min_friction, float(passable.min()))
+            halo = int(math.ceil(max_cost / min_friction)) + 1 if np.isfinite(min_friction) else 0
+
+            for row_off in range(0, src.height, tile_size):
+                for col_off in range(0, src.width, tile_size):
+                    core = Window(col_off, row_off, min(tile_size, src.width - col_off),
+                                  min(tile_size, src.height - row_off))
+                    r0, c0 = max(row_off - halo, 0), max(col_off - halo, 0)
+                    r1 = min(row_off + core.height + halo, src.height)
+                    c1 = min(col_off + core.width + halo, src.width)
+                    in_tile = (rows >= r0) & (rows < r1) & (cols >= c0) & (cols < c1)
+                    if not in_tile.any():
+                        dst.write(np.full((core.height, core.width), np.inf, dtype=np.float32),
+                                  1, window=core)
+                        continue
+                    costs = _cumulative_cost(read_friction(Window(c0, r0, c1 - c0, r1 - r0)),
+                                             rows[in_tile] - r0, cols[in_tile] - c0, max_cost)
+                    dst.write(costs[row_off - r0:row_off - r0 + core.height,
+                                    col_off - c0:col_off - c0 + core.width], 1, window=core)
+    return out_tif
+
+
+def market_access(friction_tif, destinations, zones, id_col, out_tif, max_cost=None,
+                  tile_size=None, stats=('mean', 'median', 'max'), band=1):
+    """
+    Travel time to the nearest destination as a raster and summarised per admin unit.
+
+    Parameters
+    ----------
+    friction_tif : str
+        Path to the friction raster, see travel_time_surface
+    destinations : gpd.GeoDataFrame or gpd.GeoSeries
+        Destination points, e.g. markets or cities
+    zones : gpd.GeoDataFrame
+        Admin polygons to summarise over
+    id_col : str
+        Column of zones with the admin code
+    out_tif : str
+        Path of the output travel time raster
+    max_cost : float, optional
+        Travel time cutoff, see travel_time_surface
+    tile_size : int, optional
+        Tile size for large rasters, see travel_time_surface
+    stats : sequence of str, optional
+        Statistics as accepted by zonal_stats_for_rasters, count is always
+        added. Unreachable pixels are left out of all statistics.
+    band : int, optional
+        Band of the friction raster
+
+    Returns
+    -------
+    tuple
+        (out_tif, pandas.DataFrame with one row per admin unit)
+    """
+    travel_time_surface(friction_tif, destinations, out_tif, max_cost=max_cost,
+                        tile_size=tile_size, band=band)
+    stats = tuple(stats) if 'count' in stats else ('count',) + tuple(stats)
+    summary = zonal_stats_for_rasters(zones, {'travel_time': out_tif}, id_col, stats=stats)
+    return out_tif, summary.drop(columns='date')
@@ -0,0 +1,257 @@
+"""
+OpenStreetMap extracts from Geofabrik: cached downloads and GeoParquet conversion.
+"""
+import json
+import re
+import zipfile
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import requests
+
+
+def _osm_cache_version(headers):
+    """Version label of a Geofabrik download from its Last-Modified or ETag header."""
+    if headers.get('Last-Modified'):
+        return parsedate_to_datetime(headers['Last-Modified']).strftime('%Y%m%dT%H%M%S')
+    if headers.get('ETag'):
+        return re.sub(r'\W', '', headers['ETag'])[:32]
+    return datetime.now().strftime('%Y%m%dT%H%M%S')
+
+
+def download_osm_shapefiles(region, country, outdir, layers=None,
+                            base_url='http://download.geofabrik.de', chunk_size=2**20):
+    """Downloads OSM latest shapefile from http://download.geofabrik.de/
+
+    The zip file is streamed to disk and kept in outdir as a cache together
+    with a small JSON file holding its ETag/Last-Modified headers:
+
+    - an interrupted download resumes with an HTTP Range request,
+    - a repeated call sends a conditional request and downloads nothing if
+      Geofabrik has not published a newer extract,
+    - each extract is unzipped into its own version folder, named after the
+      Last-Modified date, and only the requested layers are extracted.
+
+    Parameters
+    ----------
+    region : str
+        Continent/region where country is located as used on Geofrabrik website. For example, Africa, Asia, 
+        South America (south-america)
+    country : str
+        Country name in full _description_
+    outdir : str
+        Directory to save the data.
+    layers : list of str, optional
+        Layers to extract, e.g. ['roads', 'pois'] for gis_osm_roads_free_1.* and
+        gis_osm_pois_free_1.*. Defaults to all files in the zip.
+    base_url : str, optional
+        Root URL of the download server, e.g. a local server for testing.
+    chunk_size : int, optional
+        Number of bytes written to disk at a time.
+
+    Returns
+    --------
+    Path of the folder with the extracted files: outdir/country-latest-free-shp/version
+    """
+    start = datetime.now()
+    geofabrick_url = '{}/{}/{}-latest-free.shp.zip'.format(
+        base_url.rstrip('/'), region.lower(), country.lower())
+
+    outdir = Path(outdir)
+    assert outdir.exists(), 'ENSURE OUTPUT DIRECTORY EXISTS'
+    outfile = outdir.joinpath(geofabrick_url.split("/")[-1])
+    partfile = outfile.with_name(outfile.name + '.part')
+    metafile = outfile.with_name(outfile.name + '.json')
+    meta = json.loads(metafile.read_text()) if metafile.exists() else {}
+
+    headers = {}
+    if outfile.exists() and meta.get('complete'):
+        # Only fetch again if there is a newer extract
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    elif partfile.exists() and (meta.get('etag') or meta.get('last_modified')):
+        # Resume an interrupted download, unless the file changed in the meantime
+        headers['Range'] = 'bytes={}-'.format(partfile.stat().st_size)
+        headers['If-Range'] = meta.get('etag') or meta['last_modified']
+
+    downloaded = 0
+    with requests.get(geofabrick_url, headers=headers, stream=True,
+                      allow_redirects=True, timeout=60) as r:
+        if r.status_code == 304:
+            print('Cached file is up to date, skipping download')
+        elif r.status_code in (200, 206):
+            meta = {'url': geofabrick_url, 'etag': r.headers.get('ETag'),
+                    'last_modified': r.headers.get('Last-Modified'),
+                    'version': _osm_cache_version(r.headers), 'complete': False}
+            metafile.write_text(json.dumps(meta))
+            print('Saving file .............')
+            with open(partfile, 'ab' if r.status_code == 206 else 'wb') as f:
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    downloaded += len(chunk)
+            partfile.replace(outfile)
+            meta['complete'] = True
+            metafile.write_text(json.dumps(meta))
+        else:
+            print('ENSURE THERE IS INTERNET AND/OR REGION AND COUNTRY NAMES ARE CORRECT')
+            return
+
+    print()
+    print('Unzipping file .............')
+    extract_outdir = outdir.joinpath(outfile.name.split(".")[0] + "-shp", meta['version'])
+    extract_outdir.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(outfile, "r") as zip_ref:
+        for member in zip_ref.infolist():
+            if layers is not None and not any(
+                    f"_{layer}_" in Path(member.filename).name for layer in layers):
+                continue
+            target = extract_outdir.joinpath(member.filename)
+            if target.exists() and target.stat().st_size == member.file_size:
+                continue
+            zip_ref.extract(member, extract_outdir)
+
+    time_taken = (datetime.now() - start).total_seconds() / 60
+
+    print()
+    print('Downloading {} MB took {} minutes'.format(
+        int(downloaded / 1000000), round(time_taken, 2)))
+
+    return extract_outdir
+
+
+def _quadkeys(lons, lats, zoom):
+    """Web Mercator tile quadkeys at the given zoom level for arrays of WGS84 coordinates."""
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -85.05112878, 85.05112878)
+    n = 2 ** zoom
+    x = np.clip(np.floor((np.asarray(lons, dtype=np.float64) + 180) / 360 * n), 0, n - 1).astype(np.int64)
+    lat_rad = np.radians(lats)
+    y = np.floor((1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2 * n)
+    y = np.clip(y, 0, n - 1).astype(np.int64)
+    digits = np.zeros((len(x), zoom), dtype=np.int64)
+    for i in range(zoom):
+        mask = 1 << (zoom - 1 - i)
+        digits[:, i] = ((x & mask) > 0) + 2 * ((y & mask) > 0)
+    return np.array([''.join(map(str, d)) for d in digits])
+
+
+def osm_layers_to_geoparquet(shp_dir, out_dir, layers=('roads',), partition_by=None,
+                             zones=None, zone_col=None, quadkey_zoom=6):
+    """Convert OSM shapefile layers from download_osm_shapefiles to (partitioned) GeoParquet.
+
+    Every layer is written to out_dir/layer, either as a single file or as one
+    file per partition (out_dir/layer/partition=value/part-0.parquet). Files
+    carry a GeoParquet bbox covering column and each layer folder has a
+    _partitions.json with the bounds of every partition, so that
+    read_osm_geoparquet only opens the partitions and row groups overlapping
+    the area of interest.
+
+    Parameters
+    ----------
+    shp_dir : str
+        Folder with the extracted gis_osm_<layer>_free_1.shp files
+    out_dir : str
+        Output folder
+    layers : list of str, optional
+        Layers to convert, e.g. ['roads', 'pois', 'buildings_a']
+    partition_by : str, optional
+        None-single file per layer; zones-partition by the polygon (e.g. ADM1)
+        containing each feature; quadkey-partition by Web Mercator tile
+    zones : gpd.GeoDataFrame, optional
+        Polygons used with partition_by='zones'
+    zone_col : str, optional
+        Column of zones with the partition value, e.g. ADM1_EN
+    quadkey_zoom : int, optional
+        Zoom level of the tiles used with partition_by='quadkey'
+
+    Returns
+    -------
+    dict
+        Layer mapped to its output folder
+    """
+    assert partition_by in (None, 'zones', 'quadkey'), 'partition_by MUST BE None, zones OR quadkey'
+    outputs = {}
+    for layer in layers:
+        gdf = gpd.read_file(Path(shp_dir).joinpath(f"gis_osm_{layer}_free_1.shp"))
+        layer_dir = Path(out_dir).joinpath(layer)
+        layer_dir.mkdir(parents=True, exist_ok=True)
+
+        if partition_by is None:
+            parts = {None: gdf}
+        else:
+            points = gdf.geometry.representative_point()
+            if points.crs is not None and not points.crs.equals(4326):
+                points = points.to_crs(4326)
+            if partition_by == 'zones':
+                assert zones is not None and zone_col is not None, 'PLEASE PROVIDE zones AND zone_col'
+                joined = gpd.sjoin(gpd.GeoDataFrame(geometry=points),
+                                   zones[[zone_col, 'geometry']].to_crs(points.crs),
+                                   how='left', predicate='within')
+                # Features on a shared border keep the first zone
+                key = joined[~joined.index.duplicated()][zone_col].fillna('none').astype(str)
+            else:
+                key = pd.Series(_quadkeys(points.x.values, points.y.values, quadkey_zoom),
+                                index=gdf.index)
+            parts = {value: gdf.loc[idx] for value, idx in key.groupby(key).groups.items()}
+
+        partitions = {}
+        for value, part in parts.items():
+            if value is None:
+                path = layer_dir.joinpath('part-0.parquet')
+            else:
+                safe_value = re.sub(r'[\\/:*?"<>|]', '_', str(value))
+                path = layer_dir.joinpath(f"partition={safe_value}", 'part-0.parquet')
+                path.parent.mkdir(parents=True, exist_ok=True)
+            part.to_parquet(path, write_covering_bbox=True, row_group_size=50000)
+            partitions[str(path.relative_to(layer_dir))] = {
+                'partition': value, 'bounds': [float(b) for b in part.total_bounds]}
+
+        layer_dir.joinpath('_partitions.json').write_text(json.dumps(
+            {'crs': gdf.crs.to_wkt() if gdf.crs else None, 'partitions': partitions}))
+        outputs[layer] = layer_dir
+    return outputs
+
+
+def read_osm_geoparquet(out_dir, layer, partitions=None, bbox=None, columns=None):
+    """Read a layer written by osm_layers_to_geoparquet, only touching the needed data.
+
+    Parameters
+    ----------
+    out_dir : str
+        Folder passed to osm_layers_to_geoparquet
+    layer : str
+        Layer name, e.g. roads
+    partitions : list, optional
+        Partition values to read, e.g. ['Tigray'], defaults to all
+    bbox : tuple, optional
+        (minx, miny, maxx, maxy) in the layer CRS, partitions and row groups
+        outside it are skipped and only intersecting features are returned
+    columns : list of str, optional
+        Columns to read besides the geometry
+
+    Returns
+    -------
+    gpd.GeoDataFrame
+    """
+    layer_dir = Path(out_dir).joinpath(layer)
+    index = json.loads(layer_dir.joinpath('_partitions.json').read_text())
+    if columns is not None:
+        columns = list(columns) + ['geometry']
+
+    frames = []
+    for path, info in index['partitions'].items():
+        if partitions is not None and info['partition'] not in partitions:
+            continue
+        minx, miny, maxx, maxy = info['bounds']
+        if bbox is not None and (minx > bbox[2] or maxx < bbox[0] or miny > bbox[3] or maxy < bbox[1]):
+            continue
+        frames.append(gpd.read_parquet(layer_dir.joinpath(path), columns=columns, bbox=bbox))
+
+    if not frames:
+        return gpd.GeoDataFrame(geometry=gpd.GeoSeries([], crs=index['crs']))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,152 @@
+"""
+UTM zone lookups and per-zone reprojection helpers.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+def convert_wgs_coordinates_to_utm(lon, lat):
+    """
+    Given latitude, longitude coordinates based on WGS84, convert to
+    UTM zone and EPSG code. Shamelessly copied from here:
+    https://stackoverflow.com/questions/40132542/
+    Parameters
+    ----------
+    lon - input longitude
+    lat - input latitude
+
+    Returns EPSG code
+    -------
+
+    """
+    return str(int(utm_epsg_codes(lon, lat)))
+
+
+def utm_epsg_codes(lon, lat):
+    """
+    Vectorized WGS84 UTM EPSG code (326xx north, 327xx south) for many coordinates.
+
+    Parameters
+    ----------
+    lon : float or array-like
+        Longitudes in decimal degrees
+    lat : float or array-like
+        Latitudes in decimal degrees
+
+    Returns
+    -------
+    numpy.ndarray
+        Integer EPSG codes with the broadcast shape of the inputs
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    zone = np.floor((lon + 180) / 6).astype(np.int64) % 60 + 1
+    return np.where(lat >= 0, 32600, 32700) + zone
+
+
+def utm_epsg_codes_from_geodataframe(gdf):
+    """
+    UTM EPSG code of every feature, based on the centre of its bounding box in WGS84.
+
+    Parameters
+    ----------
+    gdf: gpd.GeoDataframe or gpd.GeoSeries
+
+    Returns
+    -------
+    pandas.Series
+        Integer EPSG codes aligned with gdf
+    """
+    geoms = gdf.geometry
+    if geoms.crs is not None and not geoms.crs.equals(4326):
+        geoms = geoms.to_crs(4326)
+    bounds = geoms.bounds
+    codes = utm_epsg_codes((bounds['minx'] + bounds['maxx']) / 2,
+                           (bounds['miny'] + bounds['maxy']) / 2)
+    return pd.Series(codes, index=gdf.index, name='utm_epsg')
+
+
+def apply_in_utm_zones(gdf, func):
+    """
+    Apply a metric operation to each feature in its own UTM zone.
+
+    Features are grouped by UTM zone (see utm_epsg_codes_from_geodataframe),
+    each group is reprojected with a single to_crs call, passed to func,
+    reprojected back to the CRS of gdf and the groups are reassembled in the
+    original order. For example, 5 km buffers around conflict events:
+    ``apply_in_utm_zones(events, lambda g: g.buffer(5000))``.
+
+    Parameters
+    ----------
+    gdf: gpd.GeoDataframe or gpd.GeoSeries
+    func: callable taking and returning a GeoDataFrame or GeoSeries in the UTM CRS of the group
+
+    Returns
+    -------
+    gpd.GeoDataframe or gpd.GeoSeries in the CRS of gdf, same index and order as gdf
+    """
+    codes = utm_epsg_codes_from_geodataframe(gdf).values
+    parts, positions = [], []
+    for epsg in np.unique(codes):
+        pos = np.nonzero(codes == epsg)[0]
+        part = func(gdf.iloc[pos].to_crs(int(epsg)))
+        parts.append(part.to_crs(gdf.crs))
+        positions.append(pos)
+    if not parts:
+        return gdf.copy()
+    result = pd.concat(parts)
+    return result.iloc[np.argsort(np.concatenate(positions), kind='stable')]
+
+
+@lru_cache(maxsize=256)
+def _query_utm_crs_codes(min_lon, min_lat, max_lon, max_lat, datum):
+    """Cached PROJ database lookup of the UTM CRS codes covering a bounding box."""
+    from pyproj.aoi import AreaOfInterest
+    from pyproj.database import query_utm_crs_info
+
+    utm_crs_list = query_utm_crs_info(
+        datum_name=datum,
+        area_of_interest=AreaOfInterest(
+            west_lon_degree=min_lon,
+            south_lat_degree=min_lat,
+            east_lon_degree=max_lon,
+            north_lat_degree=max_lat,
+        ),
+    )
+    return tuple(i[1] for i in utm_crs_list)
+
+
+def utm_zones_from_geodataframe(gdf, datum='WGS 84', return_zones=False, precision=None):
+    """
+    Returns estimated UTM CRS from the geopandas dataframe
+    Parameters
+    ----------
+    gdf: gpd.GeoDataframe: Geopandas dataframe
+    return_zones: Boolean : Whether to return UTM zones or EPSG code.
+    precision: int : Optional decimals the bounds are rounded outward to
+        before the cached PROJ lookup, so that nearby layers share cache
+        entries. Outward rounding can add a zone when a bound lies within
+        10**-precision degrees of a zone edge (3 decimals is about 100 m).
+        By default the exact bounds are used, so the result is always the
+        one of PROJ and only repeated layers hit the cache.
+
+    Returns
+    -------
+
+    """
+
+    # get layer bounds
+    min_lon, min_lat, max_lon, max_lat = gdf.total_bounds
+    if precision is not None:
+        scale = 10.0 ** precision
+        min_lon, min_lat = np.floor(np.array([min_lon, min_lat]) * scale) / scale
+        max_lon, max_lat = np.ceil(np.array([max_lon, max_lat]) * scale) / scale
+    utm_crs_code_list = list(_query_utm_crs_codes(
+        max(float(min_lon), -180.0), max(float(min_lat), -90.0),
+        min(float(max_lon), 180.0), min(float(max_lat), 90.0), datum))
+    if return_zones:
+        return [i[-2:] for i in utm_crs_code_list]
+    else:
+        return utm_crs_code_list
@@ -0,0 +1,373 @@
+"""
+Raster clipping, reprojection and point sampling with rasterio.
+"""
+import os
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.mask import mask
+from rasterio.shutil import copy as copy_raster
+from rasterio.warp import Resampling, calculate_default_transform, reproject
+from rasterio.windows import Window, intersection, union
+from rasterio.windows import intersect as windows_intersect
+
+
+def clip_raster(input_raster, clip_polygon, out_file, windowed=False, block_size=512,
+                compress='deflate'):
+    ''' 
+    Clip input raster using shapefile copied from:
+    https://github.com/worldbank/GOST/blob/Scripts/GOSTRocks/rasterMisc.py
+
+    Parameters
+    ----------
+    input_raster(rasterio object) - Raster file to clip
+    clip_polygon (Geopandas object) -  Polygon of extents to clip to
+    out_file (str) - Full path with extension of output clipped TIF
+    windowed (bool) - If True, read and write the clipped area block by block so that
+                      memory use does not depend on the raster size (see clip_raster_to_polygons)
+    block_size (int) - Size of the blocks in windowed mode, should be a multiple of 16
+    compress (str) - Compression of the tiled output TIF in windowed mode
+
+    Returns
+    -------
+    Saves TIF file to provided path (out_file)
+    '''
+    if clip_polygon.crs != input_raster.crs:
+        clip_polygon = clip_polygon.to_crs(input_raster.crs)
+
+    if windowed:
+        clip_raster_to_polygons(input_raster, [clip_polygon.union_all()], out_files=[out_file],
+                                block_size=block_size, compress=compress)
+        return
+
+    out_meta = input_raster.meta.copy()
+    # Shapely geometries are passed as is, rasterio reads them through __geo_interface__
+    out_img, out_transform = mask(input_raster, shapes=[clip_polygon.union_all()], crop=True)
+    out_meta.update({"driver": "GTiff",
+                     "height": out_img.shape[1],
+                     "width": out_img.shape[2],
+                     "transform": out_transform})
+    with rasterio.open(out_file, "w", **out_meta) as dest:
+        dest.write(out_img)
+
+
+def _iter_block_windows(src, window, block_size):
+    """
+    Split a window into sub-windows aligned to the internal block grid of src.
+
+    Blocks are whole multiples of the source's internal tiles (or strips),
+    grown to about block_size x block_size pixels, so that every read only
+    decompresses the tiles it needs, once.
+    """
+    tile_height, tile_width = src.block_shapes[0]
+    step_rows = tile_height * max(1, -(-block_size // tile_height))
+    step_cols = tile_width * max(1, -(-block_size // tile_width))
+    row_stop = window.row_off + window.height
+    col_stop = window.col_off + window.width
+    for row_off in range(window.row_off // step_rows * step_rows, row_stop, step_rows):
+        for col_off in range(window.col_off // step_cols * step_cols, col_stop, step_cols):
+            r0, c0 = max(row_off, window.row_off), max(col_off, window.col_off)
+            yield Window(c0, r0, min(col_off + step_cols, col_stop) - c0,
+                         min(row_off + step_rows, row_stop) - r0)
+
+
+def clip_raster_to_polygons(input_raster, polygons, out_dir=None, out_files=None, name_col=None,
+                            block_size=512, compress='deflate', all_touched=False):
+    '''
+    Clip a raster to many polygons in one pass over the source, block by block.
+
+    Every source block covering at least one polygon is read once and written,
+    masked, into the output of each polygon it overlaps. Only one block is held
+    in memory at a time and outputs are tiled, compressed GTiffs written
+    incrementally, so national rasters can be clipped to e.g. every ADM1 on a
+    laptop. One output file is kept open per polygon.
+
+    Parameters
+    ----------
+    input_raster(rasterio object) - Raster file to clip
+    polygons (GeoDataFrame, GeoSeries or list of shapely geometries) - Polygons to clip to.
+              Lists must already be in the raster CRS.
+    out_dir (str) - Directory for the output TIFs, named after name_col or the row position
+    out_files (list) - Explicit output paths, one per polygon, instead of out_dir
+    name_col (str) - Column of the GeoDataFrame used to name output files
+    block_size (int) - Size of the output tiles (multiple of 16) and approximate size of the
+                 processing blocks, which are rounded up to whole internal tiles of the source
+    compress (str) - Compression of the output TIFs
+    all_touched (bool) - Keep all pixels touched by a polygon instead of pixel centres only
+
+    Returns
+    -------
+    dict
+        Output name mapped to the path of the clipped TIF. Polygons that do not
+        overlap the raster are skipped.
+    '''
+    if isinstance(polygons, (gpd.GeoDataFrame, gpd.GeoSeries)):
+        if polygons.crs != input_raster.crs:
+            polygons = polygons.to_crs(input_raster.crs)
+        names = polygons[name_col].astype(str).tolist() if name_col else list(range(len(polygons)))
+        geoms = list(polygons.geometry)
+    else:
+        geoms = list(polygons)
+        names = list(range(len(geoms)))
+    if out_files is None:
+        assert out_dir is not None, 'PLEASE PROVIDE out_dir OR out_files'
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        out_files = [Path(out_dir).joinpath(f"{name}.tif") for name in names]
+
+    nodata = input_raster.nodata if input_raster.nodata is not None else 0
+    profile = input_raster.profile.copy()
+    profile.update({"driver": "GTiff", "nodata": nodata, "tiled": True,
+                    "blockxsize": block_size, "blockysize": block_size,
+                    "compress": compress, "BIGTIFF": "IF_SAFER"})
+
+    # Output window of every polygon overlapping the raster
+    clips = []
+    for name, geom, out_file in zip(names, geoms, out_files):
+        try:
+            window = geometry_window(input_raster, [geom]).round_offsets().round_lengths()
+        except WindowError:
+            print(f'Polygon {name} does not overlap the raster, skipping')
+            continue
+        clips.append((name, geom, window, out_file))
+
+    outputs = {}
+    if not clips:
+        return outputs
+    targets = []
+    try:
+        # Opened inside the try, so handles already open are closed if one fails
+        for name, geom, window, out_file in clips:
+            profile.update({"height": window.height, "width": window.width,
+                            "transform": input_raster.window_transform(window)})
+            targets.append((name, geom, window, out_file, rasterio.open(out_file, "w", **profile)))
+
+        full_window = union(*[t[2] for t in targets]).round_offsets().round_lengths()
+        for block in _iter_block_windows(input_raster, full_window, block_size):
+            overlapping = [t for t in targets if windows_intersect(block, t[2])]
+            if not overlapping:
+                continue
+            data = input_raster.read(window=block)
+            for name, geom, window, out_file, dst in overlapping:
+                part = intersection(block, window).round_offsets().round_lengths()
+                rows = slice(part.row_off - block.row_off, part.row_off - block.row_off + part.height)
+                cols = slice(part.col_off - block.col_off, part.col_off - block.col_off + part.width)
+                inside = geometry_mask([geom], out_shape=(part.height, part.width),
+                                       transform=input_raster.window_transform(part),
+                                       all_touched=all_touched, invert=True)
+                chunk = np.where(inside, data[:, rows, cols], nodata).astype(data.dtype, copy=False)
+                dst.write(chunk, window=Window(part.col_off - window.col_off,
+                                               part.row_off - window.row_off,
+                                               part.width, part.height))
+    finally:
+        for name, geom, window, out_file, dst in targets:
+            dst.close()
+            outputs[name] = out_file
+
+    return outputs
+
+
+def reproject_tif(in_tif, out_tif, dst_crs='EPSG:4326', resampling=Resampling.nearest,
+                  num_threads=1, warp_mem_limit=0, block_size=512, compress='deflate', cog=False):
+    """Use rasterio to reproject raster (or save as TIF from other formats).
+
+    The output is warped one destination block at a time, so memory use is
+    bounded by ``block_size`` and ``warp_mem_limit`` rather than by the raster
+    size, and written as a tiled, compressed GeoTIFF.
+
+    Parameters
+    ----------
+    in_tif : str
+        Full path to input raster (tif or any other format readable by GDAL)
+    out_tif : str
+        Full path to output raster (tif)
+    dst_crs : str, optional
+        Destination CRS in EPSG format
+    resampling : rasterio.enums.Resampling or str, optional
+        Resampling method, e.g. Resampling.bilinear or 'average'. Defaults to nearest.
+    num_threads : int, optional
+        Number of threads used for warping and compression
+    warp_mem_limit : int, optional
+        Working memory of the warper in MB, 0 uses the GDAL default
+    block_size : int, optional
+        Size of the output tiles and of the windows warped at once, multiple of 16
+    compress : str, optional
+        Compression of the output
+    cog : bool, optional
+        Write a Cloud-Optimized GeoTIFF with overviews instead of a plain tiled GeoTIFF
+    """
+    if isinstance(resampling, str):
+        resampling = Resampling[resampling]
+    dst_crs = CRS.from_user_input(dst_crs)
+
+    with rasterio.open(in_tif) as src:
+        transform, width, height = calculate_default_transform(
+            src.crs, dst_crs, src.width, src.height, *src.bounds)
+        kwargs = src.meta.copy()
+        kwargs.update({
+            'driver': 'GTiff',
+            'crs': dst_crs,
+            'transform': transform,
+            'width': width,
+            'height': height,
+            'tiled': True,
+            'blockxsize': block_size,
+            'blockysize': block_size,
+            'compress': compress,
+            'num_threads': num_threads,
+            'BIGTIFF': 'IF_SAFER'
+        })
+        fill = src.nodata if src.nodata is not None else 0
+
+        # A COG is produced by copying a finished tiled GeoTIFF with the COG driver
+        tmp_tif = f"{out_tif}.tmp.tif" if cog else out_tif
+        with rasterio.open(tmp_tif, 'w', **kwargs) as dst:
+            indexes = list(range(1, src.count + 1))
+            for _, window in dst.block_windows(1):
+                out = np.full((src.count, window.height, window.width), fill, dtype=dst.dtypes[0])
+                reproject(
+                    source=rasterio.band(src, indexes),
+                    destination=out,
+                    src_transform=src.transform,
+                    src_crs=src.crs,
+                    src_nodata=src.nodata,
+                    dst_transform=dst.window_transform(window),
+                    dst_crs=dst_crs,
+                    dst_nodata=src.nodata,
+                    resampling=resampling,
+                    num_threads=num_threads,
+                    warp_mem_limit=warp_mem_limit)
+                dst.write(out, window=window)
+
+    if cog:
+        try:
+            copy_raster(tmp_tif, out_tif, driver='COG', blocksize=block_size, compress=compress,
+                        overview_resampling=resampling.name, num_threads=num_threads,
+                        BIGTIFF='IF_SAFER')
+        finally:
+            os.remove(tmp_tif)
+
+
+def tif_from_other(in_tif, out_tif, dst_crs='EPSG:4326', **kwargs):
+    """Use rasterio to save as TIF from other formats, see reproject_tif for the options.
+
+    Parameters
+    ----------
+    in_tif : str
+        Full path to input raster (tif)
+    out_tif : str
+        Full path to output raster (tif)
+    dst_crs : str, optional
+        Destination CRS in EPSG format
+    """
+    reproject_tif(in_tif, out_tif, dst_crs=dst_crs, **kwargs)
+
+
+def sample_rasters_at_points(points, rasters, bands=None, interpolate='nearest', block_size=512):
+    """
+    Sample many rasters at many points, reading each raster block only once.
+
+    Points are converted to fractional pixel positions in bulk, grouped by the
+    raster block they fall in (internal tiles, or block_size rows for striped
+    rasters) and every block holding points is read once for all requested
+    bands. This replaces the per-point reads of rasterstats.gen_point_query for
+    large point sets such as ACLED events or facility locations.
+
+    Parameters
+    ----------
+    points : geopandas.GeoDataFrame or GeoSeries
+        Point geometries, reprojected to each raster CRS when needed.
+    rasters : str or list of str
+        Paths of the rasters to sample.
+    bands : list of int, optional
+        Bands to sample in every raster, defaults to all bands.
+    interpolate : str, optional
+        nearest-value of the pixel containing the point; bilinear-interpolate
+        between the four nearest pixel centres, as rasterstats.point_query.
+    block_size : int, optional
+        Number of rows read at once for rasters that are not tiled.
+
+    Returns
+    -------
+    numpy.ndarray
+        float64 array of shape (len(points), total number of sampled bands),
+        rasters and bands in the order given. Points outside a raster or on
+        nodata pixels get NaN.
+    """
+    if isinstance(rasters, (str, Path)):
+        rasters = [rasters]
+    if interpolate not in ('nearest', 'bilinear'):
+        raise ValueError("interpolate must be 'nearest' or 'bilinear'")
+
+    columns = []
+    for raster in rasters:
+        with rasterio.open(raster) as src:
+            geoms = points.geometry
+            if src.crs and geoms.crs and geoms.crs != src.crs:
+                geoms = geoms.to_crs(src.crs)
+            band_idx = list(bands) if bands is not None else list(range(1, src.count + 1))
+            out = np.full((len(geoms), len(band_idx)), np.nan)
+
+            # Fractional pixel positions of all points at once
+            inv = ~src.transform
+            xs, ys = geoms.x.values, geoms.y.values
+            cols = inv.a * xs + inv.b * ys + inv.c
+            rows = inv.d * xs + inv.e * ys + inv.f
+            inside = (cols >= 0) & (cols < src.width) & (rows >= 0) & (rows < src.height)
+
+            if interpolate == 'nearest':
+                r0, c0 = np.floor(rows).astype(np.int64), np.floor(cols).astype(np.int64)
+            else:
+                # Upper-left of the four surrounding pixel centres
+                r0 = np.floor(rows - 0.5).astype(np.int64)
+                c0 = np.floor(cols - 0.5).astype(np.int64)
+                fr, fc = rows - 0.5 - r0, cols - 0.5 - c0
+                r0, c0 = np.clip(r0, -1, src.height - 1), np.clip(c0, -1, src.width - 1)
+
+            if src.profile.get('tiled'):
+                bh, bw = src.block_shapes[0]
+            else:
+                bh, bw = block_size, src.width
+            n_block_cols = -(-src.width // bw)
+            block_id = np.clip(r0, 0, None) // bh * n_block_cols + np.clip(c0, 0, None) // bw
+
+            pts = np.nonzero(inside)[0]
+            pts = pts[np.argsort(block_id[pts], kind='stable')]
+            groups = np.split(pts, np.nonzero(np.diff(block_id[pts]))[0] + 1) if len(pts) else []
+            for group in groups:
+                brow, bcol = divmod(int(block_id[group[0]]), n_block_cols)
+                # One extra row/col on each side covers the bilinear neighbours
+                row_start, col_start = max(brow * bh - 1, 0), max(bcol * bw - 1, 0)
+                row_stop = min((brow + 1) * bh + 1, src.height)
+                col_stop = min((bcol + 1) * bw + 1, src.width)
+                window = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+                data = src.read(band_idx, window=window, masked=True).astype(np.float64)
+                data = data.filled(np.nan)
+
+                r, c = r0[group] - row_start, c0[group] - col_start
+                if interpolate == 'nearest':
+                    out[group] = data[:, r, c].T
+                else:
+                    r_lo = np.clip(r, 0, data.shape[1] - 1)
+                    r_hi = np.clip(r + 1, 0, data.shape[1] - 1)
+                    c_lo = np.clip(c, 0, data.shape[2] - 1)
+                    c_hi = np.clip(c + 1, 0, data.shape[2] - 1)
+                    wr, wc = fr[group], fc[group]
+                    values = (data[:, r_lo, c_lo] * (1 - wr) * (1 - wc) +
+                              data[:, r_lo, c_hi] * (1 - wr) * wc +
+                              data[:, r_hi, c_lo] * wr * (1 - wc) +
+                              data[:, r_hi, c_hi] * wr * wc)
+                    # Like rasterstats, fall back to the nearest pixel when a
+                    # neighbour is nodata or beyond the raster edge
+                    nearest = data[:, np.floor(rows[group]).astype(np.int64) - row_start,
+                                   np.floor(cols[group]).astype(np.int64) - col_start]
+                    edge = ((r0[group] < 0) | (r0[group] + 1 >= src.height) |
+                            (c0[group] < 0) | (c0[group] + 1 >= src.width))
+                    out[group] = np.where(edge | np.isnan(values), nearest, values).T
+            columns.append(out)
+
+    return np.hstack(columns)
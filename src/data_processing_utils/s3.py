@@ -0,0 +1,265 @@
+"""
+Read public rasters (e.g. WorldPop or nighttime lights COGs) from S3 without credentials.
+
+Rasters are opened through a file-like object issuing unsigned ranged GET
+requests with boto3, so GDAL only downloads the header and the tiles it
+actually reads. Downloaded byte ranges are kept in a local block cache with
+LRU eviction and a size cap, so repeated reads of the same area are served
+from disk.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlparse
+
+import boto3
+import rasterio
+from botocore import UNSIGNED
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from rasterio.features import geometry_window
+
+S3_CACHE_DIR = Path(os.environ.get(
+    "S3_BLOCK_CACHE_DIR", Path.home().joinpath(".cache", "s3_blocks")))
+
+
+def s3_client(endpoint_url=None, region_name=None):
+    """
+    Anonymous (unsigned) boto3 S3 client for public buckets.
+
+    Parameters
+    ----------
+    endpoint_url : str, optional
+        Custom endpoint, e.g. a MinIO server or a local S3 stand-in
+    region_name : str, optional
+        Region of the bucket
+
+    Returns
+    -------
+    botocore.client.S3
+    """
+    return boto3.client('s3', endpoint_url=endpoint_url, region_name=region_name,
+                        config=Config(signature_version=UNSIGNED))
+
+
+def _split_s3_url(url):
+    """Return (bucket, key) of an s3://bucket/key URL."""
+    parsed = urlparse(str(url))
+    assert parsed.scheme == 's3' and parsed.netloc, 'PLEASE PROVIDE AN s3://bucket/key URL'
+    return parsed.netloc, parsed.path.lstrip('/')
+
+
+class S3BlockCache:
+    """
+    On-disk cache of fixed-size byte blocks of S3 objects with LRU eviction.
+
+    Blocks are keyed by bucket, key and ETag, so a replaced object never
+    serves stale bytes. The least recently used blocks are deleted once the
+    cache grows beyond ``max_bytes``. Recency survives restarts through the
+    file modification times.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Folder of the cache, defaults to the S3_BLOCK_CACHE_DIR environment
+        variable or ~/.cache/s3_blocks
+    max_bytes : int, optional
+        Size cap of the cache in bytes
+    block_size : int, optional
+        Size of the cached blocks (and of the range requests) in bytes
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=2 * 2**30, block_size=2**20):
+        self.cache_dir = Path(cache_dir or S3_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self._lock = threading.Lock()
+
+        # Rebuild the LRU order from a previous run
+        files = sorted(self.cache_dir.glob('*.blk'), key=lambda f: f.stat().st_mtime)
+        self._blocks = OrderedDict((f.name, f.stat().st_size) for f in files)
+        self._size = sum(self._blocks.values())
+
+    def _name(self, bucket, key, etag, block):
+        digest = hashlib.sha1(f"{bucket}/{key}@{etag}".encode()).hexdigest()[:20]
+        return f"{digest}_{self.block_size}_{block:08d}.blk"
+
+    def get(self, bucket, key, etag, block):
+        """Return the cached bytes of a block or None."""
+        name = self._name(bucket, key, etag, block)
+        with self._lock:
+            if name not in self._blocks:
+                return None
+            self._blocks.move_to_end(name)
+        path = self.cache_dir.joinpath(name)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process sharing the folder
+            with self._lock:
+                self._size -= self._blocks.pop(name, 0)
+            return None
+        return data
+
+    def put(self, bucket, key, etag, block, data):
+        """Store the bytes of a block and evict the least recently used blocks above the cap."""
+        name = self._name(bucket, key, etag, block)
+        tmp_path = self.cache_dir.joinpath(f"{name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(self.cache_dir.joinpath(name))
+        with self._lock:
+            self._size += len(data) - self._blocks.pop(name, 0)
+            self._blocks[name] = len(data)
+            while self._size > self.max_bytes and len(self._blocks) > 1:
+                old_name, old_size = self._blocks.popitem(last=False)
+                self._size -= old_size
+                self.cache_dir.joinpath(old_name).unlink(missing_ok=True)
+
+    @property
+    def size(self):
+        """Current size of the cache in bytes."""
+        return self._size
+
+
+class S3RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over an S3 object, fetched block by block.
+
+    Parameters
+    ----------
+    client : botocore.client.S3
+        S3 client, see s3_client
+    bucket : str
+    key : str
+    cache : S3BlockCache
+    """
+
+    def __init__(self, client, bucket, key, cache):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.cache = cache
+        try:
+            head = client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            raise FileNotFoundError(f"s3://{bucket}/{key}") from e
+        self.size = head['ContentLength']
+        self.etag = head.get('ETag', '').strip('"')
+        self._pos = 0
+        self.requests = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._pos
+
+    def _block(self, block):
+        data = self.cache.get(self.bucket, self.key, self.etag, block)
+        if data is None:
+            start = block * self.cache.block_size
+            stop = min(start + self.cache.block_size, self.size) - 1
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key,
+                                              Range=f"bytes={start}-{stop}")
+            data = response['Body'].read()
+            self.requests += 1
+            self.cache.put(self.bucket, self.key, self.etag, block, data)
+        return data
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        n = min(len(view), max(self.size - self._pos, 0))
+        written = 0
+        block_size = self.cache.block_size
+        while written < n:
+            block, offset = divmod(self._pos + written, block_size)
+            data = self._block(block)[offset:offset + n - written]
+            view[written:written + len(data)] = data
+            written += len(data)
+        self._pos += written
+        return written
+
+
+def open_s3_raster(url, client=None, cache=None):
+    """
+    Open a raster on S3 for reading with unsigned range requests and a local block cache.
+
+    Parameters
+    ----------
+    url : str
+        s3://bucket/key of the raster, ideally a tiled GeoTIFF/COG
+    client : botocore.client.S3, optional
+        S3 client, defaults to an anonymous client (see s3_client)
+    cache : S3BlockCache, optional
+        Block cache, defaults to S3BlockCache() with its default folder and cap
+
+    Returns
+    -------
+    rasterio.io.DatasetReader
+    """
+    client = client or s3_client()
+    cache = cache or S3BlockCache()
+
+    def opener(path, mode='rb'):
+        bucket, key = _split_s3_url(path)
+        return S3RangeFile(client, bucket, key, cache)
+
+    # Avoid GDAL probing for sidecar files (.aux.xml, .ovr, ...) that do not exist
+    with rasterio.Env(GDAL_DISABLE_READDIR_ON_OPEN='EMPTY_DIR'):
+        return rasterio.open(url, opener=opener)
+
+
+def read_s3_raster_aoi(url, aoi, bands=None, client=None, cache=None):
+    """
+    Read only the part of an S3 raster covering an area of interest.
+
+    Parameters
+    ----------
+    url : str
+        s3://bucket/key of the raster
+    aoi : gpd.GeoDataFrame or gpd.GeoSeries
+        Area of interest, reprojected to the raster CRS if needed
+    bands : list of int, optional
+        Bands to read, defaults to all bands
+    client : botocore.client.S3, optional
+        S3 client, defaults to an anonymous client (see s3_client)
+    cache : S3BlockCache, optional
+        Block cache, defaults to S3BlockCache()
+
+    Returns
+    -------
+    tuple
+        (array of shape (bands, rows, cols), affine transform of the array, raster profile
+        updated to the window)
+    """
+    with open_s3_raster(url, client=client, cache=cache) as src:
+        if aoi.crs is not None and aoi.crs != src.crs:
+            aoi = aoi.to_crs(src.crs)
+        window = geometry_window(src, list(aoi.geometry)).round_offsets().round_lengths()
+        indexes = list(bands) if bands is not None else list(range(1, src.count + 1))
+        data = src.read(indexes, window=window)
+        transform = src.window_transform(window)
+        profile = src.profile.copy()
+        profile.update({'height': window.height, 'width': window.width, 'count': len(indexes),
+                        'transform': transform})
+    return data, transform, profile
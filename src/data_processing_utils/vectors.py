@@ -0,0 +1,130 @@
+"""
+Helpers to load and describe vector data.
+"""
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+from pandas.api.types import union_categoricals
+
+
+def get_bounding_box(shapefile_or_gdf):
+    """
+    Generates the bounding box with min and max latitude and longitude for a given shapefile or GeoDataFrame.
+
+    Parameters:
+    shapefile_or_gdf (str or GeoDataFrame): The path to the shapefile or a GeoDataFrame.
+
+    Returns:
+    dict: A dictionary with the min/max latitude and longitude.
+    """
+    # Check if input is a file path (str) or a GeoDataFrame
+    if isinstance(shapefile_or_gdf, str):
+        # Load the shapefile using geopandas if a file path is provided
+        gdf = gpd.read_file(shapefile_or_gdf)
+    elif isinstance(shapefile_or_gdf, gpd.GeoDataFrame):
+        # Use the provided GeoDataFrame
+        gdf = shapefile_or_gdf
+    else:
+        raise ValueError("Input must be a file path (str) or a GeoDataFrame.")
+
+    # Get the bounds of the shapefile geometry
+    bounds = gdf.total_bounds  # [minx, miny, maxx, maxy]
+    
+    # Extract the bounding box values
+    bounding_box = {
+        'min_longitude': bounds[0],  # min x (longitude)
+        'min_latitude': bounds[1],   # min y (latitude)
+        'max_longitude': bounds[2],  # max x (longitude)
+        'max_latitude': bounds[3]    # max y (latitude)
+    }
+    
+    return bounding_box
+
+
+def load_csv_into_geopandas(csv_with_coords, lat, lon, dtype=None, usecols=None, bbox=None,
+                            mask=None, chunksize=500_000, out_parquet=None, crs=4326):
+    """
+    Helper function to convert a CSV file with lat, lon into Geopandas Geodataframe
+
+    The CSV is read in chunks of ``chunksize`` rows. Rows outside ``bbox`` or
+    ``mask`` are dropped from each chunk with vectorized coordinate tests
+    before any geometry is built, and points are then created in bulk with
+    points_from_xy. With ``out_parquet`` the chunks are written to GeoParquet
+    as they are read, so memory stays bounded by the chunk size whatever the
+    size of the CSV.
+
+    Parameters
+    ----------
+    csv_with_coords(str) - Full path of CSV file with coordinates
+    lat(str) - Column name with latitude
+    lon(str) - Column name with longitude
+    dtype(dict) - Optional dtypes of columns, e.g. {'event_type': 'category', 'fatalities': 'int32'}.
+        lat and lon are read as float64 unless given here
+    usecols(list) - Optional columns to read, lat and lon are always read
+    bbox(tuple) - Optional (minx, miny, maxx, maxy) to keep, in the CRS of the coordinates
+    mask(shapely geometry, GeoDataFrame or GeoSeries) - Optional polygon(s) to keep points within
+    chunksize(int) - Number of rows read at a time
+    out_parquet(str) - Optional folder to write the points to as GeoParquet files, one per chunk
+        (part-00000.parquet, ...), readable with gpd.read_parquet(out_parquet)
+    crs - CRS of the coordinates
+
+    Returns
+    -------
+    A Geopandas GeoDataframe, or out_parquet if provided
+    """
+    dtype = {lat: 'float64', lon: 'float64', **(dtype or {})}
+    if usecols is not None:
+        usecols = list(dict.fromkeys(list(usecols) + [lat, lon]))
+
+    if mask is not None:
+        if isinstance(mask, (gpd.GeoDataFrame, gpd.GeoSeries)):
+            if mask.crs is not None:
+                mask = mask.to_crs(crs)
+            mask = mask.union_all()
+        shapely.prepare(mask)
+        mask_bounds = mask.bounds
+        bbox = mask_bounds if bbox is None else (
+            max(bbox[0], mask_bounds[0]), max(bbox[1], mask_bounds[1]),
+            min(bbox[2], mask_bounds[2]), min(bbox[3], mask_bounds[3]))
+
+    if out_parquet is not None:
+        out_parquet = Path(out_parquet)
+        out_parquet.mkdir(parents=True, exist_ok=True)
+        for old_part in out_parquet.glob('part-*.parquet'):
+            old_part.unlink()
+
+    frames = []
+    n_parts = 0
+    for df in pd.read_csv(csv_with_coords, dtype=dtype, usecols=usecols, chunksize=chunksize):
+        x = df[lon].to_numpy()
+        y = df[lat].to_numpy()
+        if bbox is not None:
+            keep = (x >= bbox[0]) & (x <= bbox[2]) & (y >= bbox[1]) & (y <= bbox[3])
+            if mask is not None:
+                keep[keep] = shapely.contains_xy(mask, x[keep], y[keep])
+            df, x, y = df[keep], x[keep], y[keep]
+        if df.empty:
+            continue
+
+        gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(x, y), crs=crs)
+        if out_parquet is None:
+            frames.append(gdf)
+        else:
+            gdf.to_parquet(out_parquet.joinpath(f"part-{n_parts:05d}.parquet"), index=False,
+                           write_covering_bbox=True)
+            n_parts += 1
+
+    if out_parquet is not None:
+        return out_parquet
+    if not frames:
+        empty = pd.read_csv(csv_with_coords, dtype=dtype, usecols=usecols, nrows=0)
+        return gpd.GeoDataFrame(empty, geometry=gpd.points_from_xy([], []), crs=crs)
+    # Chunks see different category sets, concat would fall back to object/str columns
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([frame[col] for frame in frames]).categories
+            for frame in frames:
+                frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
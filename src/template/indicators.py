@@ -1,15 +1,51 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import pandas
-import pycountry
 import requests
+from requests.adapters import HTTPAdapter
 
 
 class WorldBankIndicatorsAPI:
     URL = "https://api.worldbank.org/v2/country"
+    # Resolved country codes, shared by all instances of the class
+    _country_codes = {}
+
+    def __init__(self, max_workers: int = 8, cache_dir=None, cache_ttl: float = 86400, timeout: float = 60):
+        """
+        Parameters
+        ----------
+        max_workers : int, optional
+            Number of pages fetched concurrently, also the size of the connection pool.
+        cache_dir : str or pathlib.Path, optional
+            Folder of the persistent response cache. Responses are not cached if not provided.
+        cache_ttl : float, optional
+            Time in seconds after which a cached response is fetched again.
+        timeout : float, optional
+            Timeout in seconds of each request.
+        """
+        self.max_workers = max_workers
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def _get_country_code(self, country):
         """
         Using `pycountry`, return the ISO 3166-1 alpha-3 country code for corresponding query term.
 
+        Exact ISO 3166-1 alpha-2, alpha-3 and name lookups are tried before the
+        (slow) fuzzy search. Results are memoized for the lifetime of the process
+        and, if ``cache_dir`` is set, in a small JSON map shared across processes.
+        `pycountry` is only imported on a miss.
+
         See also:
             https://github.com/flyingcircusio/pycountry
 
@@ -27,9 +63,40 @@ class WorldBankIndicatorsAPI:
         LookupError
             If the query term is not a valid country.
         """
-        return pycountry.countries.search_fuzzy(country)[0].alpha_3
+        key = country.strip().lower()
+        if key in self._country_codes:
+            return self._country_codes[key]
+
+        map_file = self.cache_dir / "country_codes.json" if self.cache_dir else None
+        if map_file is not None and map_file.exists():
+            self._country_codes.update(json.loads(map_file.read_text()))
+            if key in self._country_codes:
+                return self._country_codes[key]
+
+        import pycountry
 
-    def _get(self, indicator, country: str = "all", params: dict = {}):
+        match = (
+            pycountry.countries.get(alpha_3=country)
+            or pycountry.countries.get(alpha_2=country)
+            or pycountry.countries.get(name=country)
+            or pycountry.countries.get(common_name=country)
+            or pycountry.countries.get(official_name=country)
+        )
+        if match is None:
+            match = pycountry.countries.search_fuzzy(country)[0]
+        self._country_codes[key] = match.alpha_3
+
+        if map_file is not None:
+            map_file.parent.mkdir(parents=True, exist_ok=True)
+            codes = json.loads(map_file.read_text()) if map_file.exists() else {}
+            codes[key] = match.alpha_3
+            tmp_file = map_file.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps(codes))
+            tmp_file.replace(map_file)
+
+        return match.alpha_3
+
+    def _get(self, indicator, country: str = "all", params: dict = None):
         """
         Retrieve a response, valid JSON response or error, from the World Bank Indicators API.
 
@@ -49,12 +116,56 @@ class WorldBankIndicatorsAPI:
         """
         url = f"{self.URL}/{country}/indicator/{indicator}"
 
-        return requests.get(url, params)
+        return self.session.get(url, params=params, timeout=self.timeout)
+
+    def _cache_file(self, indicator, country, params):
+        """Return the cache file of a request, keyed by its URL and query strings."""
+        key = json.dumps([self.URL, indicator, country, sorted(params.items())], default=str)
+
+        return self.cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
 
-    def query(self, indicator, country: list = "all", params: dict = {}):
+    def _get_json(self, indicator, country: str = "all", params: dict = None):
+        """
+        Retrieve the decoded JSON response of one page, using the persistent cache if enabled.
+
+        Parameters
+        ----------
+        indicator : str
+        country : str, optional
+        params : dict, optional
+
+        Returns
+        -------
+        list
+            Decoded JSON response, normally a ``[metadata, data]`` pair.
+        """
+        params = params or {}
+        cache_file = self._cache_file(indicator, country, params) if self.cache_dir else None
+        if cache_file is not None and cache_file.exists():
+            if time.time() - cache_file.stat().st_mtime < self.cache_ttl:
+                return json.loads(cache_file.read_text())
+
+        response = self._get(indicator, country, params)
+        response.raise_for_status()
+        payload = response.json()
+
+        # Only cache successful responses, errors come back as a single message object
+        if cache_file is not None and isinstance(payload, list) and len(payload) == 2:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps(payload))
+            tmp_file.replace(cache_file)
+
+        return payload
+
+    def query(self, indicator, country: list = "all", params: dict = None):
         """
         Retrieve a response, valid JSON response or error, from the World Bank Indicators API.
 
+        All pages are retrieved: the number of pages is read from the first
+        response and the remaining pages are fetched concurrently over a pooled
+        session.
+
         See also:
             https://datahelpdesk.worldbank.org/knowledgebase/articles/889392-about-the-indicators-api-documentation
 
@@ -75,9 +186,135 @@ class WorldBankIndicatorsAPI:
         if isinstance(country, list):
             country = ";".join([self._get_country_code(c) for c in country])
 
-        params.update({"format": "json", "per_page": 1000})
-
-        response = self._get(indicator, country, params)
-        data = response.json()[-1]
+        payload, data = self._get_all_pages([indicator], country, params)[0]
+        if data is None:
+            # Error message from the API
+            return pandas.json_normalize(payload[-1] if isinstance(payload, list) else payload)
 
         return pandas.json_normalize(data)
+
+    def _get_all_pages(self, indicators, country, params: dict = None):
+        """
+        Retrieve all pages of many indicators through a single thread pool.
+
+        The first page of every indicator is fetched concurrently, then all
+        remaining pages of all indicators, so at most ``max_workers`` requests
+        are in flight, matching the size of the connection pool.
+
+        Parameters
+        ----------
+        indicators : list
+        country : str
+        params : dict, optional
+
+        Returns
+        -------
+        list
+            One ``(first_payload, data)`` pair per indicator, in order. ``data`` is the list of
+            records of all pages, or None if the API returned an error message.
+        """
+        # Copy so that neither the caller's dict nor a shared default is mutated
+        params = dict(params or {})
+        params.update({"format": "json", "per_page": params.get("per_page", 1000)})
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            first_pages = list(executor.map(lambda indicator: self._get_json(indicator, country, params), indicators))
+
+            page_futures = []
+            for indicator, payload in zip(indicators, first_pages):
+                futures = []
+                if isinstance(payload, list) and len(payload) == 2:
+                    pages = int(payload[0].get("pages") or 1)
+                    futures = [
+                        executor.submit(self._get_json, indicator, country, {**params, "page": page})
+                        for page in range(2, pages + 1)
+                    ]
+                page_futures.append(futures)
+
+            results = []
+            for payload, futures in zip(first_pages, page_futures):
+                if not (isinstance(payload, list) and len(payload) == 2):
+                    results.append((payload, None))
+                    continue
+                data = list(payload[1] or [])
+                # Futures are read in page order
+                for future in futures:
+                    data.extend(future.result()[-1] or [])
+                results.append((payload, data))
+
+        return results
+
+    def query_many(
+        self, indicators: list, country: list = "all", params: dict = None, source: int = None, wide: bool = True
+    ):
+        """
+        Retrieve many indicators at once as a single compact panel.
+
+        With ``source``, indicators are requested together using the API's
+        semicolon-joined multi-indicator support (which requires all of them to
+        come from that source). Otherwise each indicator is queried separately and
+        concurrently.
+
+        See also:
+            https://datahelpdesk.worldbank.org/knowledgebase/articles/898581-api-basic-call-structures
+
+        Parameters
+        ----------
+        indicators : list
+            World Bank API Indicators.
+        country : list, optional
+            List of countries. The country name is converted to ISO 3166-1 alpha-3 country code.
+        params : dict, optional
+            World Bank API Indicator Query Strings.
+        source : int, optional
+            World Bank API source ID of all indicators, e.g. 2 for World Development Indicators.
+        wide : bool, optional
+            Return one column per indicator instead of a tidy (long) frame.
+
+        Returns
+        -------
+        pandas.core.frame.DataFrame
+            Tidy frame with ``country``, ``indicator`` and ``date`` (the API period, e.g.
+            ``2020`` or ``2020M01``) as categories, ``year`` (int16) and ``value`` (float32)
+            columns. With ``wide``, a frame indexed by (country, year), or by (country, date)
+            if any indicator is sub-annual, with one float32 column per indicator.
+        """
+        if isinstance(country, list):
+            country = ";".join([self._get_country_code(c) for c in country])
+
+        if source is not None:
+            params = {**(params or {}), "source": source}
+            # Keep URLs reasonably short, the API rejects very long indicator lists
+            groups = [";".join(indicators[i : i + 20]) for i in range(0, len(indicators), 20)]
+        else:
+            groups = list(indicators)
+
+        frames = [pandas.json_normalize(data) for _, data in self._get_all_pages(groups, country, params) if data]
+        frames = [frame for frame in frames if "value" in frame.columns]
+
+        columns = ["country", "indicator", "date", "year", "value"]
+        if not frames:
+            panel = pandas.DataFrame(columns=columns)
+        else:
+            df = pandas.concat(frames, ignore_index=True)
+            # Aggregates (regions, income groups) can come without an ISO3 code
+            iso3 = df["countryiso3code"].replace("", None).fillna(df["country.id"])
+            panel = pandas.DataFrame(
+                {
+                    "country": iso3,
+                    "indicator": df["indicator.id"],
+                    "date": df["date"],
+                    "year": pandas.to_numeric(df["date"].str[:4]),
+                    "value": pandas.to_numeric(df["value"]),
+                }
+            )
+
+        panel = panel.astype(
+            {"country": "category", "indicator": "category", "date": "category", "year": "int16", "value": "float32"}
+        )
+        if not wide:
+            return panel
+
+        # Sub-annual indicators (e.g. 2020M01, 2020Q1) keep their full period instead of the year
+        period = "year" if (panel["date"].astype(str).str.len() == 4).all() else "date"
+        return panel.pivot(index=["country", period], columns="indicator", values="value")
@@ -0,0 +1,141 @@
+import http.server
+import importlib.util
+import itertools
+import json
+import sys
+import threading
+import types
+import urllib.parse
+from pathlib import Path
+
+import pytest
+
+EXTRACTION_FILE = Path(__file__).parents[1].joinpath('notebooks', 'air-pollution', 'extraction.py')
+
+
+class FakeCollection:
+    """Stands for any ee.ImageCollection / FeatureCollection, all methods chain."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+
+class FakeTaskServer:
+    """
+    Fake Earth Engine task API.
+
+    Each started task reports READY, then RUNNING, then its final state:
+    FAILED if its file name contains 'fail', COMPLETED otherwise.
+    """
+
+    def __init__(self, polls=2):
+        self.polls = polls
+        self.tasks = {}
+        self.started = []
+        self.status_calls = []
+        self._ids = itertools.count()
+
+    def export(self, **kwargs):
+        server = self
+
+        class Task:
+            id = None
+            config = kwargs
+
+            def start(self):
+                self.id = f"T{next(server._ids)}"
+                server.started.append(kwargs['fileNamePrefix'])
+                final = 'FAILED' if 'fail' in kwargs['fileNamePrefix'] else 'COMPLETED'
+                server.tasks[self.id] = [server.polls, final]
+
+        return Task()
+
+    def get_task_status(self, task_ids):
+        self.status_calls.append(list(task_ids))
+        statuses = []
+        for task_id in task_ids:
+            polls, final = self.tasks[task_id]
+            self.tasks[task_id][0] -= 1
+            state = final if polls <= 0 else ('READY' if polls > 1 else 'RUNNING')
+            statuses.append({'id': task_id, 'state': state})
+        return statuses
+
+
+@pytest.fixture
+def task_server():
+    return FakeTaskServer()
+
+
+@pytest.fixture
+def extraction(task_server, tmp_path, monkeypatch):
+    """notebooks/air-pollution/extraction.py loaded with a fake ee module, state kept in tmp_path."""
+    pytest.importorskip("pandas")
+    fake_ee = types.ModuleType('ee')
+    fake_ee.Date = lambda *args: FakeCollection()
+    fake_ee.ImageCollection = lambda *args: FakeCollection()
+    fake_ee.FeatureCollection = lambda *args: FakeCollection()
+    fake_ee.Reducer = fake_ee.Filter = FakeCollection()
+    fake_ee.EEException = type('EEException', (Exception,), {})
+    fake_ee.batch = types.SimpleNamespace(Export=types.SimpleNamespace(table=types.SimpleNamespace(
+        toCloudStorage=task_server.export, toDrive=task_server.export)))
+    fake_ee.data = types.SimpleNamespace(getTaskStatus=task_server.get_task_status)
+    monkeypatch.setitem(sys.modules, 'ee', fake_ee)
+
+    spec = importlib.util.spec_from_file_location('extraction', EXTRACTION_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.EXPORT_STATE_DIR = tmp_path.joinpath('export_state')
+    # No waiting between polls
+    monkeypatch.setattr(module.time, 'sleep', lambda seconds: None)
+    return module
+
+
+class LocalServer:
+    """
+    JSON API served from a local http.server.
+
+    routes maps a URL path to the JSON body, or to a function of the query
+    string (as a dict) returning it. Unknown paths answer 404. Every request
+    path (with its query string) is kept in hits.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.hits.append(self.path)
+                url = urllib.parse.urlparse(self.path)
+                body = server.routes.get(url.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                if callable(body):
+                    body = body(dict(urllib.parse.parse_qsl(url.query)))
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def local_server():
+    server = LocalServer()
+    yield server
+    server.close()
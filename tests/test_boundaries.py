@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("geopandas")
+pytest.importorskip("pyarrow")
+
+from data_processing_utils.boundaries import get_geoboundaries_adm_layer
+
+ADM1_GEOJSON = {
+    'type': 'FeatureCollection',
+    'crs': {'type': 'name', 'properties': {'name': 'urn:ogc:def:crs:EPSG::3857'}},
+    'features': [
+        {'type': 'Feature', 'properties': {'shapeName': name, 'shapeISO': iso},
+         'geometry': {'type': 'Polygon', 'coordinates': [[[x, 0], [x + 1, 0], [x + 1, 1], [x, 1], [x, 0]]]}}
+        for x, (name, iso) in enumerate([('Northern', 'MW-N'), ('Central', 'MW-C'), ('Southern', 'MW-S')])
+    ],
+}
+
+
+def test_get_geoboundaries_adm_layer_caches_geoparquet(local_server, tmp_path):
+    local_server.routes['/api/current/gbOpen/MWI/ADM1/'] = [
+        {'boundaryISO': 'MWI', 'gjDownloadURL': f"{local_server.url}/data/MWI_ADM1.geojson"}]
+    local_server.routes['/data/MWI_ADM1.geojson'] = ADM1_GEOJSON
+    base_url = f"{local_server.url}/api/current/"
+
+    gdf = get_geoboundaries_adm_layer('mwi', 1, cache_dir=tmp_path, base_url=base_url)
+
+    assert gdf['shapeName'].tolist() == ['Northern', 'Central', 'Southern']
+    assert gdf.crs.to_epsg() == 3857
+    assert gdf.total_bounds.tolist() == [0, 0, 3, 1]
+    assert tmp_path.joinpath('gbOpen', 'MWI', 'MWI_ADM1.parquet').exists()
+    assert len(local_server.hits) == 2
+
+    cached = get_geoboundaries_adm_layer('MWI', 1, cache_dir=tmp_path, base_url=base_url)
+
+    assert len(local_server.hits) == 2
+    assert cached.crs == gdf.crs
+    assert cached.drop(columns='geometry').equals(gdf.drop(columns='geometry'))
+    assert cached.geometry.geom_equals(gdf.geometry).all()
+
+    get_geoboundaries_adm_layer('MWI', 1, cache_dir=tmp_path, base_url=base_url, refresh=True)
+    assert len(local_server.hits) == 4
@@ -0,0 +1,101 @@
+"""
+Benchmark of the vectorized haversine distances against the previous row-wise implementation.
+
+The row-wise references below are the former DataFrame.apply versions of
+distance_to_points and distance_matrix, results must match. The speed
+tests are marked ``benchmark`` and skipped by default, run them with
+``pytest -m benchmark -s``: the vectorized versions must be at least
+MIN_SPEEDUP times faster, rows (or pairs) per second are printed.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing_utils.distances import (
+    distance_between_points,
+    distance_matrix,
+    distance_to_points,
+)
+
+MIN_SPEEDUP = 10
+Point = namedtuple("Point", ["point_id", "x", "y"])
+
+
+def _rowwise_distance_to_points(df, target_pt):
+    return df.apply(lambda x: distance_between_points(pt1=(x['lat'], x['lon']),
+                                                      pt2=(target_pt[0], target_pt[1])), axis=1).values
+
+
+def _rowwise_distance_matrix(xy_list):
+    df = pd.DataFrame([dict(d._asdict()) for d in xy_list])
+    for pt in xy_list:
+        df['to_' + str(pt.point_id)] = df.apply(lambda x, pt=pt: distance_between_points(
+            pt1=(x['x'], x['y']), pt2=(pt.x, pt.y)), axis=1)
+    return df
+
+
+def _best_time(func, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _compare_distance_to_points(n):
+    """Check distance_to_points against the row-wise version, return (row-wise, vectorized) seconds."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'lat': rng.uniform(3, 15, n), 'lon': rng.uniform(33, 48, n), 'id': np.arange(n)})
+    target = (9.03, 38.74)
+
+    old_time, old = _best_time(lambda: _rowwise_distance_to_points(df, target), repeat=1)
+    new_time, new = _best_time(lambda: distance_to_points(df, target, output='dist_list'))
+
+    np.testing.assert_allclose(new, old, rtol=1e-9)
+    assert np.isclose(distance_to_points(df, target, output='nearest'), old.min(), rtol=1e-12)
+    assert distance_to_points(df, target, output='nearest_id') == df['id'].iloc[old.argmin()]
+    return old_time, new_time
+
+
+def _compare_distance_matrix(n):
+    """Check distance_matrix against the row-wise version, return (row-wise, vectorized) seconds."""
+    rng = np.random.default_rng(1)
+    xy_list = [Point(i, x, y) for i, (x, y) in enumerate(zip(rng.uniform(3, 15, n), rng.uniform(33, 48, n)))]
+
+    old_time, old = _best_time(lambda: _rowwise_distance_matrix(xy_list), repeat=1)
+    new_time, new = _best_time(lambda: distance_matrix(xy_list))
+
+    pd.testing.assert_frame_equal(new, old, check_dtype=False, rtol=1e-9)
+    return old_time, new_time
+
+
+def test_distance_to_points_matches_rowwise():
+    _compare_distance_to_points(500)
+
+
+# The row-wise reference inserts one column per point, as the former implementation did
+@pytest.mark.filterwarnings("ignore::pandas.errors.PerformanceWarning")
+def test_distance_matrix_matches_rowwise():
+    _compare_distance_matrix(40)
+
+
+@pytest.mark.benchmark
+def test_distance_to_points_benchmark():
+    n = 5000
+    old_time, new_time = _compare_distance_to_points(n)
+    print(f"\ndistance_to_points: {n / old_time:,.0f} rows/s row-wise, {n / new_time:,.0f} rows/s vectorized")
+    assert old_time / new_time > MIN_SPEEDUP
+
+
+@pytest.mark.benchmark
+@pytest.mark.filterwarnings("ignore::pandas.errors.PerformanceWarning")
+def test_distance_matrix_benchmark():
+    pairs = 150 ** 2
+    old_time, new_time = _compare_distance_matrix(150)
+    print(f"\ndistance_matrix: {pairs / old_time:,.0f} pairs/s row-wise, "
+          f"{pairs / new_time:,.0f} pairs/s vectorized")
+    assert old_time / new_time > MIN_SPEEDUP
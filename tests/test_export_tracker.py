@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+
+def test_tracker_polls_all_tasks_in_batched_calls(extraction, task_server, tmp_path):
+    tracker = extraction.ExportTaskTracker(state_file=tmp_path.joinpath('state.json'))
+    extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-10', 'bucket',
+                                               tracker=tracker, wait=False, manifest=None)
+    extraction.process_no2_data_for_aoi_to_drive(None, 'fail', '2024-01-01', '2024-01-05',
+                                                 tracker=tracker, wait=False)
+
+    states = tracker.wait()
+
+    assert len(task_server.started) == 11
+    # One status call per poll for all unfinished tasks, not one per task
+    assert len(task_server.status_calls) == 3
+    assert len(task_server.status_calls[0]) == 11
+    assert [state['state'] for state in states.values()].count('COMPLETED') == 10
+    assert json.loads(tmp_path.joinpath('state.json').read_text()) == tracker.state
+
+
+def test_restart_resumes_in_flight_tasks_and_skips_completed(extraction, task_server):
+    extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-05', 'bucket',
+                                               wait=False, manifest=None)
+    assert len(task_server.started) == 5
+
+    # Same call after a crash: the state file is found and nothing is started again
+    tracker = extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-05', 'bucket',
+                                                         manifest=None)
+    assert len(task_server.started) == 5
+    assert {entry['state'] for entry in tracker.state.values()} == {'COMPLETED'}
+
+    extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-05', 'bucket',
+                                               manifest=None)
+    assert len(task_server.started) == 5
+
+
+def test_resubmit_starts_completed_exports_again(extraction, task_server):
+    extraction.process_no2_data_for_aoi_to_drive(None, 'eth', '2024-01-01', '2024-01-05')
+    extraction.process_no2_data_for_aoi_to_drive(None, 'eth', '2024-01-01', '2024-01-05')
+    assert len(task_server.started) == 1
+
+    tracker = extraction.process_no2_data_for_aoi_to_drive(None, 'eth', '2024-01-01', '2024-01-05',
+                                                           resubmit=True)
+    assert len(task_server.started) == 2
+    assert [entry['state'] for entry in tracker.state.values()] == ['COMPLETED']
+
+
+def test_failed_exports_are_started_again(extraction, task_server):
+    extraction.process_no2_data_for_aoi_to_drive(None, 'fail', '2024-01-01', '2024-01-05')
+    tracker = extraction.process_no2_data_for_aoi_to_drive(None, 'fail', '2024-01-01', '2024-01-05')
+    assert len(task_server.started) == 2
+    assert [entry['state'] for entry in tracker.state.values()] == ['FAILED']
+
+
+def test_native_and_admin_exports_do_not_collide(extraction, task_server):
+    admin_regions = object()
+    native = extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-03', 'bucket',
+                                                        manifest=None)
+    adm1 = extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-03', 'bucket',
+                                                      admin_regions=admin_regions, admin_level='adm1', manifest=None)
+    adm3 = extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-03', 'bucket',
+                                                      admin_regions=admin_regions, admin_level='adm3', manifest=None)
+
+    assert len(task_server.started) == 9
+    assert len(set(native.state) | set(adm1.state) | set(adm3.state)) == 9
+    assert 'gs://bucket/no2_eth_adm1/20240101.csv#adm1' in adm1.state
+    assert len({native.state_file, adm1.state_file, adm3.state_file}) == 3
+
+    extraction.process_monthly_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-03-01', 'bucket')
+    extraction.process_monthly_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-03-01', 'bucket',
+                                                       admin_regions=admin_regions, admin_level='adm1')
+    assert len(task_server.started) == 11
+    assert task_server.started[-2:] == ['no2_eth_20240101_20240301', 'no2_eth_adm1_20240101_20240301']
+
+
+def test_admin_regions_without_admin_level_keep_the_old_prefix(extraction, task_server):
+    native = extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-03', 'bucket',
+                                                        manifest=None)
+    admin = extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-03', 'bucket',
+                                                       admin_regions=object(), manifest=None)
+
+    assert task_server.started[-3:] == task_server.started[:3] == ['no2_eth/20240101', 'no2_eth/20240102',
+                                                                    'no2_eth/20240103']
+    # Same output files, but separate tasks and state files
+    assert 'gs://bucket/no2_eth/20240101.csv#admin' in admin.state
+    assert not set(native.state) & set(admin.state)
+    assert native.state_file != admin.state_file
+
+
+def test_export_mode_rejects_inconsistent_admin_level(extraction):
+    assert extraction.export_mode('eth') == ('native', 'eth')
+    assert extraction.export_mode('eth', object(), 'adm2') == ('adm2', 'eth_adm2')
+    with pytest.raises(ValueError):
+        extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', '2024-01-01', '2024-01-03', 'bucket',
+                                                   admin_level='adm1', manifest=None)
+    with pytest.raises(ValueError):
+        extraction.export_mode('eth', object(), 'native')
@@ -0,0 +1,295 @@
+import random
+import threading
+import types
+
+import pandas as pd
+import pytest
+
+
+def test_iter_days_covers_each_day_once(extraction):
+    days = list(extraction.iter_days('2024-01-01', '2024-02-15'))
+
+    assert days[0] == '2024-01-01'
+    assert days[-1] == '2024-02-15'
+    assert len(days) == len(set(days)) == 46
+    assert list(extraction.iter_days('2024-03-01', '2024-03-01')) == ['2024-03-01']
+
+
+def test_drive_export_processes_chunk_boundary_days_once(extraction, monkeypatch):
+    days = []
+    monkeypatch.setattr(extraction, 'calculate_daily_no2_for_single_day',
+                        lambda day, aoi, collection: days.append(day) or collection)
+
+    extraction.process_no2_data_for_aoi_to_drive(None, 'eth', '2024-01-01', '2024-01-25')
+
+    assert days == list(extraction.iter_days('2024-01-01', '2024-01-25'))
+
+
+def test_scheduler_returns_results_in_request_order(extraction):
+    def backend(request):
+        # Later requests often finish first
+        threading.Event().wait(random.uniform(0, 0.01))
+        return request * 2
+
+    scheduler = extraction.EERequestScheduler(max_workers=4, backend=backend)
+
+    assert scheduler.map(range(50)) == [request * 2 for request in range(50)]
+    assert scheduler.requests == 50
+
+
+def test_scheduler_retries_transient_errors_with_backoff(extraction, monkeypatch):
+    delays = []
+    monkeypatch.setattr(extraction.time, 'sleep', delays.append)
+    failures = {'count': 0}
+
+    def backend(request):
+        if failures['count'] < 3:
+            failures['count'] += 1
+            raise extraction.ee.EEException('Too many concurrent aggregations.')
+        return request
+
+    scheduler = extraction.EERequestScheduler(max_workers=1, backoff=2.0, max_backoff=5.0, backend=backend)
+
+    assert scheduler.map(['a']) == ['a']
+    assert scheduler.retries == 3
+    # Doubling waits with jitter in [0.5, 1] of the nominal wait, capped at max_backoff
+    for delay, nominal in zip(delays, [2.0, 4.0, 5.0]):
+        assert nominal / 2 <= delay <= nominal
+
+
+def test_scheduler_raises_other_errors_and_gives_up_after_max_retries(extraction):
+    def bad_request(request):
+        raise extraction.ee.EEException('Image.load: Image asset not found.')
+
+    def quota(request):
+        raise extraction.ee.EEException('User memory limit exceeded: quota')
+
+    with pytest.raises(extraction.ee.EEException, match='not found'):
+        extraction.EERequestScheduler(backend=bad_request).map([1])
+    scheduler = extraction.EERequestScheduler(max_retries=2, backoff=0, backend=quota)
+    with pytest.raises(extraction.ee.EEException, match='quota'):
+        scheduler.map([1])
+    assert scheduler.requests == 3
+
+
+def test_scheduler_caps_requests_in_flight(extraction):
+    lock = threading.Lock()
+    active = {'now': 0, 'max': 0}
+
+    def backend(request):
+        with lock:
+            active['now'] += 1
+            active['max'] = max(active['max'], active['now'])
+        threading.Event().wait(0.005)
+        with lock:
+            active['now'] -= 1
+        return request
+
+    pulled = []
+
+    def requests():
+        for request in range(100):
+            pulled.append(request)
+            yield request
+
+    scheduler = extraction.EERequestScheduler(max_workers=3, backend=backend)
+    for n_results, _ in enumerate(scheduler.imap(requests()), start=1):
+        # The lazy iterable is only read ahead by 2 * max_workers requests
+        assert len(pulled) - n_results < 2 * 3
+
+    assert active['max'] == 3
+
+
+def sink_frame(day, n):
+    return pd.DataFrame({'date': day, 'NO2': [0.5] * n, 'longitude': [38.7] * n, 'latitude': [9.0] * n})
+
+
+def test_daily_record_sink_csv(extraction, tmp_path):
+    output = tmp_path.joinpath('out', 'no2.csv')
+    with extraction.DailyRecordSink(output, file_format='csv') as sink:
+        sink.write('2024-01-01', sink_frame('2024-01-01', 2))
+        sink.write('2024-01-02', sink_frame('2024-01-02', 0))
+        sink.write('2024-01-03', sink_frame('2024-01-03', 3))
+
+    df = pd.read_csv(output)
+    assert sink.rows == 5
+    assert df.columns.tolist() == extraction.NO2_RECORD_COLUMNS
+    assert df['date'].tolist() == ['2024-01-01'] * 2 + ['2024-01-03'] * 3
+
+
+def test_daily_record_sink_parquet(extraction, tmp_path):
+    pytest.importorskip("pyarrow")
+    output = tmp_path.joinpath('no2')
+    with extraction.DailyRecordSink(output, file_format='parquet') as sink:
+        sink.write('2024-01-01', sink_frame('2024-01-01', 2))
+        sink.write('2024-01-02', sink_frame('2024-01-02', 3))
+        # Writing a day again replaces it
+        sink.write('2024-01-02', sink_frame('2024-01-02', 1))
+
+    df = pd.read_parquet(output)
+    assert sorted(path.parent.name for path in output.glob('*/part-0.parquet')) == [
+        'date=2024-01-01', 'date=2024-01-02']
+    assert df['date'].astype(str).tolist() == ['2024-01-01'] * 2 + ['2024-01-02']
+    assert not list(output.rglob('*.tmp'))
+
+
+def test_scheduler_backend_is_swappable(extraction):
+    class StubClient:
+        """Stands in for the ee client: computes requests locally and counts the calls."""
+
+        def __init__(self):
+            self.calls = []
+
+        def compute(self, request):
+            self.calls.append(request)
+            return {'features': [{'properties': {'date': request}}]}
+
+    client = StubClient()
+    scheduler = extraction.EERequestScheduler(max_workers=2, backend=client.compute)
+    days = list(extraction.iter_days('2024-01-01', '2024-01-05'))
+
+    assert [result['features'][0]['properties']['date'] for result in scheduler.map(days)] == days
+    assert sorted(client.calls) == days
+
+    # A backend given per call replaces the scheduler's one for those requests only
+    assert scheduler.map(days, backend=len) == [10] * 5
+    assert len(client.calls) == 5
+
+    # The default backend only needs objects with getInfo(), not ee itself
+    class Request:
+        def getInfo(self):
+            return 'computed'
+
+    assert extraction.EERequestScheduler().map([Request()]) == ['computed']
+
+
+class GraphFake:
+    """
+    Local stand-in for the parts of the ee client used by the daily NO2 graph.
+
+    Objects are evaluated eagerly: the NO2 collection has a number of pixels
+    per day (days not listed have no images), and getInfo() counts requests
+    and fails like Earth Engine above 5000 features.
+    """
+
+    def __init__(self, ee, pixels_per_day):
+        self.ee = ee
+        self.pixels_per_day = pixels_per_day
+        self.requests = 0
+        fake = self
+
+        class Date:
+            def __init__(self, day):
+                self.day = day
+
+            def advance(self, delta, unit):
+                return Date((pd.Timestamp(self.day) + pd.Timedelta(days=delta)).strftime('%Y-%m-%d'))
+
+            def format(self, pattern):
+                return self.day
+
+        class Feature(dict):
+            def set(self, key, value):
+                properties = {**self['properties'], key: value}
+                return Feature(self, properties=properties)
+
+        class FeatureCollection:
+            def __init__(self, items):
+                self.items = list(items)
+
+            def map(self, function):
+                return FeatureCollection(function(item) for item in self.items)
+
+            def flatten(self):
+                return FeatureCollection(feature for collection in self.items for feature in collection.items)
+
+            def getInfo(self):
+                fake.requests += 1
+                if len(self.items) > 5000:
+                    raise ee.EEException('Collection query aborted after accumulating over 5000 elements.')
+                return {'type': 'FeatureCollection', 'features': [dict(item) for item in self.items]}
+
+        class Number(int):
+            def gt(self, other):
+                return self > other
+
+        class Image:
+            def __init__(self, day, pixels):
+                self.day, self.pixels = day, pixels
+
+            def sample(self, **kwargs):
+                return FeatureCollection(Feature(
+                    type='Feature', geometry={'type': 'Point', 'coordinates': [38.0 + i / 1000, 9.0]},
+                    properties={'NO2_column_number_density': 1e-5}) for i in range(self.pixels))
+
+        class ImageCollection:
+            def __init__(self, day=None):
+                self.day = day
+
+            def select(self, *args):
+                return self
+
+            def filterDate(self, start, end):
+                return ImageCollection(start.day)
+
+            def size(self):
+                return Number(self.day in fake.pixels_per_day)
+
+            def mean(self):
+                return Image(self.day, fake.pixels_per_day.get(self.day, 0))
+
+        self.patches = {
+            'Date': Date,
+            'ImageCollection': lambda *args: ImageCollection(),
+            'FeatureCollection': FeatureCollection,
+            'List': lambda items: types.SimpleNamespace(map=lambda function: [function(i) for i in items]),
+            'Algorithms': types.SimpleNamespace(If=lambda condition, true, false: true if condition else false),
+        }
+
+
+@pytest.fixture
+def graph_fake(extraction, monkeypatch):
+    def make(pixels_per_day):
+        fake = GraphFake(extraction.ee, pixels_per_day)
+        for name, value in fake.patches.items():
+            monkeypatch.setattr(extraction.ee, name, value, raising=False)
+        return fake
+    return make
+
+
+def test_daily_batches_follow_the_chunk_windows(extraction):
+    batches = extraction.daily_batches('2024-01-01', '2024-01-25')
+
+    assert [(batch[0], batch[-1]) for batch in batches] == [
+        ('2024-01-01', '2024-01-10'), ('2024-01-11', '2024-01-20'), ('2024-01-21', '2024-01-25')]
+    assert [day for batch in batches for day in batch] == list(extraction.iter_days('2024-01-01', '2024-01-25'))
+    assert extraction.daily_batches('2024-01-01', '2024-01-01') == [['2024-01-01']]
+
+
+def test_daily_no2_is_fetched_in_one_request_per_window(extraction, graph_fake, tmp_path):
+    days = list(extraction.iter_days('2024-01-01', '2024-01-25'))
+    # No images on 2024-01-04 and 2024-01-22
+    fake = graph_fake({day: 3 for day in days if day not in ('2024-01-04', '2024-01-22')})
+
+    output_file = extraction.process_no2_data_for_aoi_to_file(
+        None, '2024-01-01', '2024-01-25', 'eth', output_dir=tmp_path,
+        scheduler=extraction.EERequestScheduler(max_workers=3))
+
+    assert fake.requests == 3
+    df = pd.read_csv(output_file)
+    assert len(df) == 23 * 3
+    assert df['date'].unique().tolist() == [day for day in days if day not in ('2024-01-04', '2024-01-22')]
+    assert df['date'].is_monotonic_increasing
+
+
+def test_batches_over_5000_features_are_halved(extraction, graph_fake):
+    days = list(extraction.iter_days('2024-01-01', '2024-01-10'))
+    fake = graph_fake({day: 2000 for day in days[:4]} | {day: 10 for day in days[4:]})
+
+    features, n_requests = extraction.get_daily_no2_for_dates(days, None, extraction.ee.ImageCollection())
+
+    # 10 days fail, then the first 5 days (8010 features) fail again and are split into 2 + 3 days
+    assert n_requests == fake.requests == 5
+    assert len(features) == 4 * 2000 + 6 * 10
+    assert [feature['properties']['date'] for feature in features] == sorted(
+        feature['properties']['date'] for feature in features)
@@ -0,0 +1,70 @@
+"""
+Import-time budget of the light helpers, measured with ``python -X importtime``.
+
+Importing geoprocessing_utils and using distance_between_points must not pull
+the geospatial stack (rasterio, geopandas, ...), nor importing the package
+pandas or numpy. The time budgets are marked ``benchmark`` and skipped by
+default, run them with ``pytest -m benchmark``. The budget can be changed with
+the IMPORT_TIME_BUDGET_MS environment variable on slow machines.
+"""
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parents[1].joinpath("src")
+BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", "1500"))
+HEAVY_MODULES = ("rasterio", "rasterstats", "geopandas", "pyproj", "shapely", "skimage", "boto3",
+                 "botocore", "IPython", "pycountry")
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def _importtime(code):
+    """Return (name, cumulative microseconds, nesting) of every module imported by code."""
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                            capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imports.append((match.group(4), int(match.group(2)), len(match.group(3))))
+    return imports
+
+
+def _import_cost_ms(code):
+    """Cumulative import time of code in ms and the names of all modules it imported."""
+    baseline = {name for name, _, _ in _importtime("pass")}
+    imports = [item for item in _importtime(code) if item[0] not in baseline]
+    # Top-level entries include the time of the modules they import
+    total_us = sum(cumulative for _, cumulative, nesting in imports if nesting == 0)
+    return total_us / 1000, {name for name, _, _ in imports}
+
+
+LIGHT_IMPORT = "import data_processing_utils.geoprocessing_utils as g; g.distance_between_points"
+
+
+def test_geoprocessing_utils_import_does_not_load_geospatial_stack():
+    _, modules = _import_cost_ms(LIGHT_IMPORT)
+    heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES)
+    assert not heavy, f"heavy modules imported: {heavy}"
+
+
+def test_package_import_does_not_load_pandas():
+    _, modules = _import_cost_ms("import data_processing_utils")
+    assert "pandas" not in modules and "numpy" not in modules
+
+
+@pytest.mark.benchmark
+def test_geoprocessing_utils_import_budget():
+    cost_ms, _ = _import_cost_ms(LIGHT_IMPORT)
+    assert cost_ms < BUDGET_MS, f"import took {cost_ms:.0f} ms, budget {BUDGET_MS:.0f} ms"
+
+
+@pytest.mark.benchmark
+def test_package_import_budget():
+    cost_ms, _ = _import_cost_ms("import data_processing_utils")
+    assert cost_ms < BUDGET_MS / 10, f"import took {cost_ms:.0f} ms"
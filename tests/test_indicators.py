@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+
+import pytest
+
+from template.indicators import WorldBankIndicatorsAPI
+
+ROWS = [
+    {'indicator': {'id': 'NY.GDP.MKTP.CD', 'value': 'GDP'}, 'country': {'id': iso3[:2], 'value': iso3},
+     'countryiso3code': iso3, 'date': str(year), 'value': float(year)}
+    for iso3 in ['ETH', 'KEN'] for year in range(2000, 2023)
+]
+ERROR = [{'message': [{'id': '120', 'key': 'Invalid value', 'value': 'The provided parameter value is not valid'}]}]
+
+
+def indicator_pages(rows):
+    def respond(query):
+        per_page, page = int(query['per_page']), int(query.get('page', 1))
+        meta = {'page': page, 'pages': -(-len(rows) // per_page), 'per_page': per_page, 'total': len(rows)}
+        return [meta, rows[(page - 1) * per_page:page * per_page]]
+    return respond
+
+
+@pytest.fixture
+def api(local_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(WorldBankIndicatorsAPI, 'URL', f"{local_server.url}/v2/country")
+    monkeypatch.setattr(WorldBankIndicatorsAPI, '_country_codes', {})
+    local_server.routes['/v2/country/ETH;KEN/indicator/NY.GDP.MKTP.CD'] = indicator_pages(ROWS)
+    local_server.routes['/v2/country/ETH;KEN/indicator/SP.POP.TOTL'] = indicator_pages(
+        [{**row, 'indicator': {'id': 'SP.POP.TOTL', 'value': 'Population'}} for row in ROWS])
+    local_server.routes['/v2/country/ETH;KEN/indicator/BAD'] = ERROR
+    return WorldBankIndicatorsAPI(max_workers=4, cache_dir=tmp_path.joinpath('cache'))
+
+
+def test_query_returns_all_pages_in_order(api, local_server):
+    params = {'per_page': 5}
+
+    df = api.query('NY.GDP.MKTP.CD', ['Ethiopia', 'Kenya'], params=params)
+
+    assert len(local_server.hits) == 10
+    assert df['countryiso3code'].tolist() == [row['countryiso3code'] for row in ROWS]
+    assert df['date'].tolist() == [row['date'] for row in ROWS]
+    # The caller's params are not changed by the paging
+    assert params == {'per_page': 5}
+
+
+def test_error_payload(api):
+    error = api.query('BAD', ['ETH', 'KEN'])
+    assert error['message'].tolist() == [ERROR[0]['message']]
+
+    panel = api.query_many(['NY.GDP.MKTP.CD', 'BAD', 'SP.POP.TOTL'], ['ETH', 'KEN'], params={'per_page': 10})
+    assert panel.columns.tolist() == ['NY.GDP.MKTP.CD', 'SP.POP.TOTL']
+    assert panel.shape == (46, 2)
+    assert panel.loc[('KEN', 2022), 'SP.POP.TOTL'] == 2022
+
+
+def test_cache_hit_within_ttl_and_refetch_after(api, local_server):
+    first = api.query('NY.GDP.MKTP.CD', ['ETH', 'KEN'])
+    n_hits = len(local_server.hits)
+
+    cached = api.query('NY.GDP.MKTP.CD', ['ETH', 'KEN'])
+    assert len(local_server.hits) == n_hits
+    assert cached.equals(first)
+
+    # Age the cached responses past the TTL
+    for cache_file in api.cache_dir.glob('*.json'):
+        mtime = cache_file.stat().st_mtime - api.cache_ttl - 1
+        os.utime(cache_file, (mtime, mtime))
+    api.query('NY.GDP.MKTP.CD', ['ETH', 'KEN'])
+    assert len(local_server.hits) == 2 * n_hits
+
+
+def test_country_codes_memo_map(api, monkeypatch):
+    assert api._get_country_code('Kenya') == 'KEN'
+    map_file = api.cache_dir.joinpath('country_codes.json')
+    assert json.loads(map_file.read_text()) == {'kenya': 'KEN'}
+
+    # A new process: empty memo, the map file answers without importing pycountry
+    monkeypatch.setattr(WorldBankIndicatorsAPI, '_country_codes', {})
+    monkeypatch.setitem(sys.modules, 'pycountry', None)
+    assert WorldBankIndicatorsAPI(cache_dir=api.cache_dir)._get_country_code(' KENYA ') == 'KEN'
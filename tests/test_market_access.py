@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("skimage")
+rasterio = pytest.importorskip("rasterio")
+gpd = pytest.importorskip("geopandas")
+
+from rasterio.transform import from_origin
+from shapely.geometry import Point
+
+from data_processing_utils.market_access import travel_time_surface
+
+
+def write_friction(path, friction):
+    with rasterio.open(path, 'w', driver='GTiff', width=friction.shape[1], height=friction.shape[0], count=1,
+                       dtype='float32', crs='EPSG:32637', transform=from_origin(0, friction.shape[0], 1, 1)) as dst:
+        dst.write(friction.astype(np.float32), 1)
+
+
+def test_tiled_travel_time_matches_a_single_run_across_a_zero_friction_corridor(tmp_path):
+    friction = np.ones((60, 60))
+    # A free corridor from the destination across several tile edges
+    friction[30, 5:55] = 0
+    friction_tif = tmp_path.joinpath('friction.tif')
+    write_friction(friction_tif, friction)
+    destinations = gpd.GeoSeries([Point(4.5, 60 - 30.5)], crs='EPSG:32637')
+
+    full = travel_time_surface(friction_tif, destinations, tmp_path.joinpath('full.tif'), max_cost=12)
+    tiled = travel_time_surface(friction_tif, destinations, tmp_path.joinpath('tiled.tif'), max_cost=12,
+                                tile_size=16)
+
+    with rasterio.open(full) as src:
+        full_costs = src.read(1)
+    with rasterio.open(tiled) as src:
+        tiled_costs = src.read(1)
+    np.testing.assert_array_equal(tiled_costs, full_costs)
+    # Zero friction pixels are impassable, the corridor does not carry paths further
+    assert np.isinf(full_costs[30, 6:55]).all()
+    assert np.isfinite(full_costs[29, 14]) and np.isinf(full_costs[29, 30])
@@ -0,0 +1,83 @@
+def output_info(uri):
+    return 100, f"md5-{uri}"
+
+
+def export_days(extraction, manifest, start_date, end_date, bucket='bucket', **kwargs):
+    kwargs = {'admin_regions': object(), 'admin_level': 'adm3', **kwargs}
+    return extraction.process_no2_data_for_aoi_to_gcs(None, 'eth', start_date, end_date, bucket, manifest=manifest,
+                                                      output_info=output_info, **kwargs)
+
+
+def test_rerun_only_exports_new_days(extraction, task_server, tmp_path):
+    manifest_file = tmp_path.joinpath('manifest.sqlite')
+    export_days(extraction, manifest_file, '2024-01-01', '2024-01-10')
+    export_days(extraction, manifest_file, '2024-01-01', '2024-01-12')
+
+    assert len(task_server.started) == 12
+    with extraction.PartitionManifest(manifest_file) as manifest:
+        entry = manifest.get('eth', '2024-01-11', 'adm3', 'bucket')
+        summary = manifest.summary()
+    assert entry['status'] == 'COMPLETED'
+    assert entry['rows'] == 100
+    assert entry['uri'] == 'gs://bucket/no2_eth_adm3/20240111.csv'
+    assert summary['partitions'].tolist() == [12]
+
+
+def test_other_bucket_is_exported_again(extraction, task_server, tmp_path):
+    manifest_file = tmp_path.joinpath('manifest.sqlite')
+    export_days(extraction, manifest_file, '2024-01-01', '2024-01-05')
+    export_days(extraction, manifest_file, '2024-01-01', '2024-01-05', bucket='backup')
+
+    assert len(task_server.started) == 10
+    with extraction.PartitionManifest(manifest_file) as manifest:
+        assert manifest.summary().set_index('bucket')['partitions'].to_dict() == {'backup': 5, 'bucket': 5}
+        assert manifest.get('eth', '2024-01-01', 'adm3', 'backup')['uri'] == 'gs://backup/no2_eth_adm3/20240101.csv'
+
+
+def test_manifest_does_not_record_tasks_of_other_modes(extraction, task_server, tmp_path):
+    # Another call on the same tracker left native exports of the same days in its state
+    tracker = extraction.ExportTaskTracker()
+    export_days(extraction, None, '2024-01-01', '2024-01-10', tracker=tracker, wait=False, admin_regions=None,
+                admin_level=None)
+
+    with extraction.PartitionManifest(tmp_path.joinpath('manifest.sqlite')) as manifest:
+        export_days(extraction, manifest, '2024-01-01', '2024-01-12', tracker=tracker)
+        summary = manifest.summary()
+        assert manifest.get('eth', '2024-01-01', 'native', 'bucket') is None
+    assert len(task_server.started) == 22
+    assert summary[['admin_level', 'status', 'partitions']].values.tolist() == [['adm3', 'COMPLETED', 12]]
+
+
+def test_days_completed_by_the_tracker_are_reconciled(extraction, task_server, tmp_path):
+    manifest_file = tmp_path.joinpath('manifest.sqlite')
+    export_days(extraction, None, '2024-01-01', '2024-01-05')
+    export_days(extraction, manifest_file, '2024-01-01', '2024-01-05')
+
+    # The tracker state file has them all as completed, nothing is exported again
+    assert len(task_server.started) == 5
+    with extraction.PartitionManifest(manifest_file) as manifest:
+        assert manifest.summary()[['status', 'partitions', 'rows']].values.tolist() == [['COMPLETED', 5, 500]]
+
+
+def test_in_flight_exports_are_synced_on_the_next_run(extraction, task_server, tmp_path):
+    manifest_file = tmp_path.joinpath('manifest.sqlite')
+    export_days(extraction, manifest_file, '2024-01-01', '2024-01-05', wait=False)
+    with extraction.PartitionManifest(manifest_file) as manifest:
+        assert set(manifest.summary()['status']) == {'SUBMITTED'}
+
+    for _ in range(3):
+        task_server.get_task_status(list(task_server.tasks))
+    export_days(extraction, manifest_file, '2024-01-01', '2024-01-05', wait=False)
+
+    assert len(task_server.started) == 5
+    with extraction.PartitionManifest(manifest_file) as manifest:
+        assert set(manifest.summary()['status']) == {'COMPLETED'}
+        assert manifest.get('eth', '2024-01-03', 'adm3', 'bucket')['rows'] == 100
+
+
+def test_manifest_opened_from_a_path_is_closed(extraction, tmp_path, monkeypatch):
+    closed = []
+    monkeypatch.setattr(extraction.PartitionManifest, 'close', lambda self: closed.append(self.path))
+    manifest_file = tmp_path.joinpath('manifest.sqlite')
+    export_days(extraction, manifest_file, '2024-01-01', '2024-01-02')
+    assert closed == [manifest_file]
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("geopandas")
+
+from data_processing_utils.vectors import load_csv_into_geopandas
+
+
+def test_load_csv_into_geopandas_keeps_categories_across_chunks(tmp_path):
+    rng = np.random.default_rng(0)
+    # Later chunks see categories the first ones never saw
+    cats = np.where(np.arange(1000) < 500, rng.choice(['a', 'b'], 1000), rng.choice(['a', 'c', 'd'], 1000))
+    csv_file = tmp_path.joinpath('points.csv')
+    pd.DataFrame({'lat': rng.uniform(3, 15, 1000), 'lon': rng.uniform(33, 48, 1000), 'cat': cats}).to_csv(
+        csv_file, index=False)
+
+    gdf = load_csv_into_geopandas(csv_file, 'lat', 'lon', dtype={'cat': 'category'}, chunksize=50)
+
+    assert isinstance(gdf['cat'].dtype, pd.CategoricalDtype)
+    assert set(gdf['cat'].cat.categories) == {'a', 'b', 'c', 'd'}
+    assert (gdf['cat'].astype(str).to_numpy() == cats).all()